@@ -0,0 +1,22 @@
+"""Users and leagues shared by the benchmarks."""
+import csv
+
+from utils.tournament_utils import TournamentUtils
+
+
+def write_users(path, players, league):
+    """Writes {path}/users.csv with `players` active users of the league, best rated first."""
+    with open(f'{path}/users.csv', 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['ID', 'username', 'nick', 'rate', 'active', 'league'])
+        for i in range(players):
+            writer.writerow([1000 + i, f'player{i}', f'nick{i}', 3000 - i, 1, league])
+
+
+def schedule_groups(db, path, tag, groups):
+    """Creates season 1 of the league with every user dealt round-robin into `groups` groups."""
+    league = TournamentUtils(db, path, tag, 1)
+    ids = [user['ID'] for user in db.get_all_users()]
+    group_ids = [ids[i::groups] for i in range(groups)]
+    league.write_group_schedule(group_ids)
+    return league, group_ids
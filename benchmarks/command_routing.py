@@ -0,0 +1,74 @@
+"""Routes 100k synthetic 'бот, ...' messages through the chat command registries.
+
+`legacy` is the old chain: re.sub, split, then check_pattern for every
+command in turn, each call lower-casing the whole word list again. The
+routers tokenize once and only look at the commands indexed under the
+message's words. Both must pick the same command for every message.
+
+    python -m benchmarks.command_routing
+"""
+import random
+import re
+import time
+
+from command_handlers import common_commands, superleague_commands
+from utils.command_router import tokenize
+
+MESSAGES = 100000
+
+TEXTS = [
+    'бот, рейтинг лиги', 'Бот рейтинг лиги эло', 'бот, мой рейтинг 1234', 'бот, мой ник Striker',
+    'бот, вычеркни рейтинг @player7', 'бот статус', 'бот, кто не участвует?', 'бот, история лиги',
+    'бот, моя история!', 'бот, личные встречи @player1 @player2', 'бот, мои матчи', 'бот +1',
+    'бот, дебаг', 'бот, стартуй', 'бот, регистрируй',
+    'бот, выиграл у @player3 3-1', 'бот, @player4 2:2', 'бот, привет, как дела?',
+    'бот, когда следующий тур и кто играет в финале лиги чемпионов?',
+]
+
+
+def check_pattern(words, pattern):
+    list = pattern.split()
+    lowercased_words = [word.lower() for word in words]
+    for word in list:
+        if word not in lowercased_words:
+            return False
+    return True
+
+
+def legacy_route(text, commands, is_owner):
+    words = re.sub(r'[.,?!\-]', ' ', text).split()[1:]
+    for command in commands:
+        if command.owner and not is_owner:
+            continue
+        if check_pattern(words, command.pattern):
+            return command
+    return None
+
+
+def router_route(text, router, is_owner):
+    words, lowered = tokenize(text)
+    return router.match(lowered, is_owner)
+
+
+def timed(name, route, messages, router):
+    start = time.perf_counter()
+    result = [route(text, router, is_owner) for text, is_owner in messages]
+    elapsed = time.perf_counter() - start
+    print(f'{name:22} {elapsed * 1000:8.1f} ms, {elapsed / len(messages) * 1e6:.2f} us per message')
+    return result
+
+
+def main():
+    rng = random.Random(1)
+    messages = [(rng.choice(TEXTS), rng.random() < 0.1) for _ in range(MESSAGES)]
+
+    for name, router in (('common chat', common_commands), ('superleague chat', superleague_commands)):
+        legacy = timed(f'{name}, legacy', lambda text, router, owner: legacy_route(text, router.commands, owner),
+                       messages, router)
+        routed = timed(f'{name}, router', router_route, messages, router)
+        assert legacy == routed
+    print('router picks the same command as the check_pattern chain')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Counts league file parses per score confirmation.
+
+Replays the score_confirm_callback -> update_post flow for a 7-group CL
+season twice: the way the bot used to do it (a fresh TournamentUtils per
+lookup that re-reads the CSV in get_stage, write_score, update_playoff_path,
+get_metainfo and get_user_matches_list) and through the get_tournament
+registry.
+
+    python -m benchmarks.confirm_parses
+"""
+import contextlib
+import io
+import itertools
+import tempfile
+import time
+
+from benchmarks._fixtures import schedule_groups, write_users
+from utils.tournament_utils import TournamentUtils, get_tournament
+from utils.users_database import UsersDatabaseCSV
+
+GROUPS = 7
+GROUP_SIZE = 4
+CONFIRMATIONS = 50
+
+
+def make_database(path):
+    write_users(path, GROUPS * GROUP_SIZE, 'CL')
+    db = UsersDatabaseCSV(path)
+    _, groups = schedule_groups(db, path, 'CL', GROUPS)
+    return db, groups
+
+
+class LegacyTournamentUtils(TournamentUtils):
+    """TournamentUtils with the per-call re-reads the bot used to do."""
+
+    def _reread(name):
+        def method(self, *args, **kwargs):
+            self._read_data()
+            return getattr(TournamentUtils, name)(self, *args, **kwargs)
+        return method
+
+    get_stage = _reread('get_stage')
+    write_score = _reread('write_score')
+    update_playoff_path = _reread('update_playoff_path')
+    get_metainfo = _reread('get_metainfo')
+    get_user_matches_list = _reread('get_user_matches_list')
+    del _reread
+
+
+def confirm(lookup, id0, id1):
+    tour_db = lookup()
+    respond = tour_db.write_score(id0, id1, (2, 1))
+    lookup().get_status()
+    tour_db.get_stage()
+    return respond
+
+
+def run(name, pairs, lookup):
+    parses = 0
+    read_data = TournamentUtils._read_data
+
+    def counting_read_data(self):
+        nonlocal parses
+        parses += 1
+        read_data(self)
+
+    TournamentUtils._read_data = counting_read_data
+    try:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for id0, id1 in pairs:
+                assert confirm(lookup, id0, id1) == 'Результат зафиксирован!'
+        elapsed = time.perf_counter() - start
+    finally:
+        TournamentUtils._read_data = read_data
+
+    print(f'{name:10} {parses / len(pairs):6.1f} parses/confirmation '
+          f'{elapsed / len(pairs) * 1000:8.2f} ms/confirmation')
+
+
+def main():
+    for name in ('before', 'after'):
+        with tempfile.TemporaryDirectory() as path:
+            with contextlib.redirect_stdout(io.StringIO()):
+                db, groups = make_database(path)
+            pairs = list(itertools.islice(
+                (pair for group in groups for pair in itertools.combinations(group, 2)),
+                CONFIRMATIONS))
+
+            if name == 'before':
+                lookup = lambda: LegacyTournamentUtils(db, path, 'CL', 1)
+            else:
+                lookup = lambda: get_tournament(db, path, 'CL', 1)
+            run(name, pairs, lookup)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Times group and playoff draws for a 512-player field.
+
+The old Drawer turned the remaining pot into a list on every pick; it is
+kept here as `legacy` for comparison (it knows no rules). The new one
+draws 64 groups of 8 with players of the same country kept apart, then a
+256-pair playoff round without group-mates, and is checked for validity
+and for replaying the same draw from the same seed.
+
+    python -m benchmarks.draw_512
+"""
+import random
+import time
+
+from utils.drawer import Drawer, separate
+
+PLAYERS = 512
+GROUPS = 64
+COUNTRIES = 40
+
+
+def legacy_pick(elems):
+    choice = random.choice(list(elems))
+    elems.remove(choice)
+    return choice
+
+
+def legacy_group_draw(ids, number_of_groups):
+    pots = [set(ids[i:i + number_of_groups]) for i in range(0, len(ids), number_of_groups)]
+    groups = [[] for _ in range(number_of_groups)]
+    for pot in pots:
+        for i in range(len(pot)):
+            groups[i % number_of_groups].append(legacy_pick(pot))
+    return groups
+
+
+def legacy_playoff_draw(listA, listB):
+    setA, setB = set(listA), set(listB)
+    return [[legacy_pick(setA), legacy_pick(setB)] for _ in range(len(listA))]
+
+
+def timed(name, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    print(f'{name:22} {(time.perf_counter() - start) * 1000:8.1f} ms')
+    return result
+
+
+def draw(seed, ids, country):
+    groups = Drawer(seed, [separate(country)]).make_group_draw(ids, GROUPS)
+    group_of = {player: index for index, group in enumerate(groups) for player in group}
+    qualified = [player for group in groups for player in group[:4]]
+    pairs = Drawer(seed, [separate(group_of)]).make_playoff_draw(qualified[::2], qualified[1::2])
+    return groups, group_of, pairs
+
+
+def main():
+    rng = random.Random(1)
+    ids = list(range(PLAYERS))
+    country = {player: rng.randrange(COUNTRIES) for player in ids}
+
+    random.seed(1)
+    timed('legacy groups', legacy_group_draw, ids, GROUPS)
+    timed('legacy playoff', legacy_playoff_draw, ids[:PLAYERS // 2], ids[PLAYERS // 2:])
+
+    timed('groups, no rules', Drawer(7).make_group_draw, ids, GROUPS)
+    groups = timed('groups, countries', Drawer(7, [separate(country)]).make_group_draw, ids, GROUPS)
+    assert sorted(player for group in groups for player in group) == ids
+    assert all(len({country[player] for player in group}) == len(group) for group in groups)
+
+    group_of = {player: index for index, group in enumerate(groups) for player in group}
+    qualified = [player for group in groups for player in group[:4]]
+    pairs = timed('playoff, group-mates', Drawer(7, [separate(group_of)]).make_playoff_draw,
+                  qualified[::2], qualified[1::2])
+    assert all(group_of[A] != group_of[B] for A, B in pairs)
+    assert sorted(player for pair in pairs for player in pair) == sorted(qualified)
+
+    assert draw(7, ids, country) == draw(7, ids, country)
+    print('draws valid and reproducible from the seed')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""Times a full Elo replay of a synthetic 100k-match history.
+
+Compares the one-match-at-a-time replay (what EloRatings does without
+NumPy) with the batched NumPy replay and checks they agree.
+
+    python -m benchmarks.elo_replay
+"""
+import random
+import time
+
+import utils.ratings as ratings_module
+from utils.ratings import EloRatings
+
+PLAYERS = 1000
+MATCHES = 100_000
+
+
+def make_history(seed=1):
+    rng = random.Random(seed)
+    strength = [rng.gauss(0, 1) for _ in range(PLAYERS)]
+    matches = []
+    for _ in range(MATCHES):
+        id0, id1 = rng.sample(range(PLAYERS), 2)
+        edge = strength[id0] - strength[id1]
+        matches.append((id0, id1, max(0, round(rng.gauss(1.3 + edge, 1))), max(0, round(rng.gauss(1.3 - edge, 1)))))
+    return matches
+
+
+def run(name, matches):
+    ratings = EloRatings(k=32, base=1500)
+    start = time.perf_counter()
+    ratings.replay(matches)
+    elapsed = time.perf_counter() - start
+    print(f'{name:8} {elapsed * 1000:9.1f} ms  {len(matches) / elapsed:12,.0f} matches/s')
+    return ratings
+
+
+def main():
+    matches = make_history()
+    numpy = ratings_module.np
+    if numpy is None:
+        print('NumPy is not installed, only the sequential replay is available')
+
+    ratings_module.np = None
+    try:
+        sequential = run('python', matches)
+    finally:
+        ratings_module.np = numpy
+
+    if numpy is not None:
+        batched = run('numpy', matches)
+        drift = max(abs(sequential.ratings[player] - batched.ratings[player]) for player in sequential.ratings)
+        assert drift < 1e-6, drift
+        print(f'max rating difference {drift:.2e}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Measures the memory taken by league rows and by a get_status render.
+
+Compares the dict rows and __dict__ Match/Item/Group objects the league
+used to build with the slotted MatchRow and group_handler classes:
+bytes per stored match, and the blocks kept alive and peak memory of an
+uncached get_status on a 16-group league.
+
+    python -m benchmarks.memory_records
+"""
+import contextlib
+import io
+import tempfile
+import tracemalloc
+
+from benchmarks._fixtures import schedule_groups, write_users
+import utils.group_handler as group_handler
+import utils.tournament_utils as tournament_utils
+from utils.users_database import UsersDatabaseCSV
+
+GROUPS = 16
+GROUP_SIZE = 8
+RUNS = 5
+
+
+def make_league(path):
+    write_users(path, GROUPS * GROUP_SIZE, 'SL')
+    db = UsersDatabaseCSV(path)
+    league, _ = schedule_groups(db, path, 'SL', GROUPS)
+    for row in league.data[::2]:
+        league.write_score(row['id0'], row['id1'], (2, 1))
+    return league
+
+
+def unslotted(cls):
+    """Same class without __slots__, i.e. the way it used to be declared."""
+    members = {name: value for name, value in vars(cls).items()
+               if name not in ('__slots__', '__dict__', '__weakref__') and name not in cls.__slots__}
+    return type(cls.__name__, (), members)
+
+
+@contextlib.contextmanager
+def legacy_objects(league):
+    """Swaps in dict rows and __dict__ Match/Item/Group for the duration."""
+    classes = {name: getattr(group_handler, name) for name in ('Match', 'Item', 'Group')}
+    rows = league.data
+    for name, cls in classes.items():
+        setattr(group_handler, name, unslotted(cls))
+        setattr(tournament_utils, name, getattr(group_handler, name))
+    league.data = [row.to_dict() for row in rows]
+    league._reindex()
+    try:
+        yield
+    finally:
+        for name, cls in classes.items():
+            setattr(group_handler, name, cls)
+            setattr(tournament_utils, name, cls)
+        league.data = rows
+        league._reindex()
+
+
+def bytes_per_match(league):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    copies = [row.copy() for row in league.data]
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del copies
+    return size / len(league.data)
+
+
+def render(league):
+    retained = peak = 0
+    for _ in range(RUNS):
+        league._groups = None
+        league._render_cache.clear()
+        tracemalloc.start()
+        snapshot = tracemalloc.take_snapshot()
+        league.get_status()
+        retained += sum(stat.count_diff for stat in tracemalloc.take_snapshot().compare_to(snapshot, 'filename'))
+        peak += tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return retained / RUNS, peak / RUNS
+
+
+def main():
+    with tempfile.TemporaryDirectory() as path:
+        with contextlib.redirect_stdout(io.StringIO()):
+            league = make_league(path)
+
+        for name in ('before', 'after'):
+            scope = legacy_objects(league) if name == 'before' else contextlib.nullcontext()
+            with scope, contextlib.redirect_stdout(io.StringIO()):
+                per_match = bytes_per_match(league)
+                blocks, peak = render(league)
+            print(f'{name:10} {per_match:7.1f} bytes/match '
+                  f'{blocks:8.0f} blocks kept per get_status '
+                  f'{peak / 1024:8.1f} KiB peak per get_status')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Times the qualification simulator on a half-played 7-group CL season.
+
+    python -m benchmarks.qualification_odds
+"""
+import contextlib
+import io
+import random
+import tempfile
+import time
+
+from benchmarks._fixtures import write_users
+import utils.simulator as simulator
+from utils.simulator import QualificationSimulator
+from utils.tournament_utils import TournamentUtils
+from utils.users_database import UsersDatabaseCSV
+
+GROUPS = 7
+GROUP_SIZE = 6
+SIMULATIONS = 10000
+
+
+def make_league(path):
+    write_users(path, GROUPS * GROUP_SIZE, 'CL')
+    db = UsersDatabaseCSV(path)
+    league = TournamentUtils(db, path, 'CL', 1)
+    random.seed(1)
+    league.make_groups(GROUPS)
+    rows = list(league.data)
+    random.shuffle(rows)
+    for row in rows[:len(rows) // 2]:
+        league.write_score(row['id0'], row['id1'], (random.randint(0, 3), random.randint(0, 3)))
+    return league
+
+
+def run(name, model):
+    start = time.perf_counter()
+    odds = model.run(SIMULATIONS, seed=1)
+    elapsed = time.perf_counter() - start
+    print(f'{name:16} {elapsed * 1000:8.1f} ms for {SIMULATIONS} seasons')
+    return odds
+
+
+def main():
+    with tempfile.TemporaryDirectory() as path:
+        with contextlib.redirect_stdout(io.StringIO()):
+            league = make_league(path)
+        model = QualificationSimulator(league)
+        print(f'{len(model.players)} players, {len(model.remaining)} matches left, top {model.promoted} go through')
+
+        numpy = simulator.np
+        if numpy is not None:
+            odds = run('numpy', model)
+        simulator.np = None
+        try:
+            reference = run('python', model)
+        finally:
+            simulator.np = numpy
+
+        if numpy is not None:
+            drift = max(abs(odds[player][1] - reference[player][1]) for player in odds)
+            print(f'max playoff probability difference {drift:.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""Parses the reports in score_reports.txt with the old and the new parser.
+
+score_reports.txt is a fixed set of reports written the way players
+write them, each with the answer it should get, including the plain
+"выиграл @user 3:1" the old parser already handled, so a regression in
+either shows up as a listed mismatch. `legacy` is the old per-word
+ScoreProcessor fed the way the bot fed it: the words of
+parse_bot_request, which split "3-1" apart. The whole file is also
+parsed as one parse_many batch, empty lines and all.
+
+    python -m benchmarks.score_reports
+"""
+import contextlib
+import io
+import os
+import re
+import time
+
+from score_processor import parse_many, parse_report
+
+CORPUS = os.path.join(os.path.dirname(__file__), 'score_reports.txt')
+ROUNDS = 5000
+
+
+class LegacyScoreProcessor:
+    WIN_WORDS = {'выиграл', 'победил', 'обыграл'}
+    LOSE_WORDS = {'проиграл', 'проебал'}
+
+    def __init__(self, words):
+        self.words = words
+        self.result = None
+        self.username = None
+        self.score = None
+
+    def parse_result(self, word):
+        if word in self.WIN_WORDS:
+            return 'WIN'
+        elif word in self.LOSE_WORDS:
+            return 'LOSE'
+        elif 'ничь' in word:
+            return 'DRAW'
+        return None
+
+    def parse_username(self, word):
+        if word.startswith('@'):
+            return word[1:]
+        return None
+
+    def parse_score(self, word):
+        if ':' in word:
+            try:
+                g0, g1 = map(int, word.split(':'))
+                return (g0, g1)
+            except ValueError:
+                pass
+        return None
+
+    def validate_and_adjust_score(self):
+        if self.result == 'DRAW' and self.score[0] != self.score[1]:
+            return None
+        if self.result != 'DRAW' and self.score[0] == self.score[1]:
+            return None
+        if self.result == 'WIN' and self.score[0] < self.score[1]:
+            self.score = (self.score[1], self.score[0])
+        if self.result == 'LOSE' and self.score[0] > self.score[1]:
+            self.score = (self.score[1], self.score[0])
+        return self.score
+
+    def get_report(self):
+        print(self.words)
+        for word in self.words:
+            if not self.result:
+                self.result = self.parse_result(word)
+            if not self.username:
+                self.username = self.parse_username(word)
+            if not self.score:
+                self.score = self.parse_score(word)
+        if self.result and self.username and self.score:
+            self.score = self.validate_and_adjust_score()
+            if self.score:
+                return (self.username, self.score)
+        return None
+
+
+def legacy_parse(text):
+    return LegacyScoreProcessor(re.sub(r'[.,\-]', ' ', text).split()).get_report()
+
+
+def load_corpus():
+    corpus = []
+    with open(CORPUS, encoding='utf-8') as file:
+        for line in file:
+            if line.startswith('#'):
+                continue
+            text, expected = line.rstrip('\n').split('\t')
+            if expected != '-':
+                username, score = expected.split()
+                expected = (username, tuple(map(int, score.split(':'))))
+            else:
+                expected = None
+            corpus.append((text, expected))
+    return corpus
+
+
+def run(name, parse, corpus):
+    texts = [text for text, _ in corpus]
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = list(parse(texts))
+        start = time.perf_counter()
+        for _ in range(ROUNDS):
+            list(parse(texts))
+        elapsed = time.perf_counter() - start
+
+    wrong = [(text, result, expected) for result, (text, expected) in zip(results, corpus) if result != expected]
+    print(f'{name:8} {len(texts) * ROUNDS / elapsed:10.0f} reports/s   '
+          f'{len(corpus) - len(wrong)}/{len(corpus)} correct')
+    for text, result, expected in wrong:
+        print(f'    {text!r}: got {result}, expected {expected}')
+    return results
+
+
+def main():
+    corpus = load_corpus()
+    run('legacy', lambda texts: map(legacy_parse, texts), corpus)
+    batch = run('new', parse_many, corpus)
+    assert batch == [parse_report(text) for text, _ in corpus], 'parse_many differs from parse_report'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""Fires concurrent write_score calls at one league and checks nothing is lost.
+
+Two rounds against a fresh league each:
+
+* in-process: every pending match of a big group stage is confirmed at
+  once with asyncio.gather through the shared AsyncFacade, the way
+  concurrent score_confirm_callback updates would;
+* multi-process: several processes with their own TournamentUtils write
+  interleaved halves of the schedule into the same directory.
+
+Afterwards the league is reloaded from disk and every score must be there.
+
+    python -m benchmarks.stress_write_score [csv|journal|sqlite]
+"""
+import asyncio
+import contextlib
+import io
+import multiprocessing
+import sys
+import tempfile
+import time
+
+from benchmarks._fixtures import schedule_groups, write_users
+from utils.async_storage import facade_for
+from utils.config_utils import CONFIG
+from utils.storage import migrate_csv_to_sqlite
+from utils.tournament_utils import TournamentUtils
+from utils.users_database import UsersDatabaseCSV
+
+GROUPS = 8
+GROUP_SIZE = 6
+PROCESSES = 4
+
+
+def make_league(path):
+    write_users(path, GROUPS * GROUP_SIZE, 'CL')
+    if CONFIG['storage'] == 'sqlite':
+        migrate_csv_to_sqlite(path)
+
+    db = UsersDatabaseCSV(path)
+    league, _ = schedule_groups(db, path, 'CL', GROUPS)
+    return db, league
+
+
+def expected_score(row):
+    return (row['ID'] % 5, row['ID'] % 3)
+
+
+def check(path, db):
+    league = TournamentUtils(db, path, 'CL', 1)
+    missing = [row for row in league.data if row['score'] != '{}:{}'.format(*expected_score(row))]
+    return len(league.data), len(missing)
+
+
+async def confirm_all(league):
+    facade = facade_for(league)
+    # Both legs of a pair share the players, so each call records the next free leg.
+    pending = [(row['id0'], row['id1'], expected_score(row)) for row in league.data]
+    return await asyncio.gather(*(facade.write_score(*args) for args in pending))
+
+
+def run_in_process(path):
+    db, league = make_league(path)
+    start = time.perf_counter()
+    responds = asyncio.run(confirm_all(league))
+    elapsed = time.perf_counter() - start
+    assert all(respond == 'Результат зафиксирован!' for respond in responds)
+    return len(responds), elapsed, check(path, db)
+
+
+def worker(path, backend, part):
+    CONFIG['storage'] = backend
+    with contextlib.redirect_stdout(io.StringIO()):
+        league = TournamentUtils(UsersDatabaseCSV(path), path, 'CL', 1)
+        # Both legs of a pair go to the same process, in order.
+        rows = [row for index, row in enumerate(list(league.data)) if index // 2 % PROCESSES == part]
+        for row in rows:
+            league.write_score(row['id0'], row['id1'], expected_score(row))
+
+
+def run_multi_process(path, backend):
+    db, league = make_league(path)
+    start = time.perf_counter()
+    processes = [multiprocessing.Process(target=worker, args=(path, backend, part)) for part in range(PROCESSES)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - start
+    return len(league.data), elapsed, check(path, db)
+
+
+def main():
+    backend = sys.argv[1] if len(sys.argv) > 1 else 'csv'
+    CONFIG['storage'] = backend
+
+    with tempfile.TemporaryDirectory() as path:
+        with contextlib.redirect_stdout(io.StringIO()):
+            calls, elapsed, (rows, missing) = run_in_process(path)
+        print(f'{backend} in-process:    {calls} concurrent write_score in {elapsed:.2f}s, '
+              f'{rows - missing}/{rows} persisted')
+        assert missing == 0
+
+    with tempfile.TemporaryDirectory() as path:
+        with contextlib.redirect_stdout(io.StringIO()):
+            calls, elapsed, (rows, missing) = run_multi_process(path, backend)
+        print(f'{backend} multi-process: {calls} write_score from {PROCESSES} processes in {elapsed:.2f}s, '
+              f'{rows - missing}/{rows} persisted')
+        assert missing == 0
+
+
+if __name__ == '__main__':
+    main()
@@ -3,29 +3,48 @@ from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
 
 
-from utils.tournament_utils import TournamentUtils
+from utils.tournament_utils import get_tournament
+from utils.archive import get_archive
+from utils.ratings import get_ratings
 from utils.config_utils import CONFIG
 from score_processor import ScoreProcessor
-from utils.users_database import UsersDatabaseCSV
-from utils.super_league_registrator import SuperLeagueRegistrator
+from utils.users_database import get_users_database
+from utils.registration import get_registration_store
+from utils.async_storage import facade_for, run_blocking
+from utils.admin_cache import AdminCache
+from utils.outbox import EditScheduler
+from utils.command_router import CommandRouter, Request, tokenize
+from utils.metrics import track_update
+from utils.profiling import profile_update, get_recent_slow_updates
 
 import re
-import random
 
-def getUsersDatabase():
-    return UsersDatabaseCSV(CONFIG.get('database_path'))
+async def getUsersDatabase():
+    db = await run_blocking(get_users_database, CONFIG.get('database_path'))
+    return facade_for(db)
 
-def getLeagueDatabase(tag, season):
-    db = getUsersDatabase()
-    return TournamentUtils(db, CONFIG.get('database_path'), tag, season)
+async def getLeagueDatabase(tag, season):
+    db = await getUsersDatabase()
+    league = await run_blocking(get_tournament, db.target, CONFIG.get('database_path'), tag, season)
+    return facade_for(league)
 
+async def getArchive():
+    archive = await run_blocking(get_archive, CONFIG.get('database_path'))
+    return facade_for(archive)
+
+async def getRegistrationStore():
+    store = await run_blocking(get_registration_store, CONFIG.get('database_path'))
+    return facade_for(store)
+
+
+admin_cache = AdminCache()
 
 async def is_user_admin(chat, user):
-    admins = await chat.get_administrators()
-    for admin in admins:
-        if admin.user.id == user.id:
-            return True
-    return False
+    return await admin_cache.is_admin(chat.get_bot(), chat.id, user.id)
+
+@track_update('chat_member_update')
+async def chat_member_update(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    admin_cache.on_chat_member(update.chat_member or update.my_chat_member)
 
 reactions = {}
 draw_in_progress = False
@@ -54,13 +73,15 @@ async def show_score_confirmation(db, message, op_id, score, edit_message_id, le
     ]
     
     reply_markup = InlineKeyboardMarkup(keyboard)
-    username = db.get_username_by_id(user_id)
-    op_username = db.get_username_by_id(op_id)
+    username = await db.get_username_by_id(user_id)
+    op_username = await db.get_username_by_id(op_id)
     await message.reply_text(
         f'@{username} {score[0]}:{score[1]} @{op_username}', 
         reply_markup=reply_markup
     )
 
+@track_update('score_confirm_callback')
+@profile_update('score_confirm_callback')
 async def score_confirm_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     query = update.callback_query
     user = query.from_user
@@ -88,8 +109,8 @@ async def score_confirm_callback(update: Update, context: ContextTypes.DEFAULT_T
     if tag not in ['CL', 'EL', 'SL']:
         respond = "Турнир не идентифицирован"
     else:
-        tour_db = getLeagueDatabase(tag, season)
-        respond = tour_db.write_score(id_main, id1, (g0, g1))
+        tour_db = await getLeagueDatabase(tag, season)
+        respond = await tour_db.write_score(id_main, id1, (g0, g1))
     
     await query.answer()
     await query.edit_message_text(text=respond)
@@ -97,40 +118,35 @@ async def score_confirm_callback(update: Update, context: ContextTypes.DEFAULT_T
     if respond == 'Результат зафиксирован!':
         await update_post(context.bot, edit_id, tag, season)
 
-        stage = tour_db.get_stage()
-        if stage == 'GROUP-COMPLETE':
-            tour_db.make_playoff()
-            if tag == 'SL':
-                await update_post(context.bot, edit_id, tag, season)
-            else:
-                await make_post(context.bot, tour_db.get_status())
-        elif stage == 'PLAYOFF-COMPLETE':
-            await make_post(context.bot, tour_db.get_summary())
+        for stage in await tour_db.pop_transitions():
+            if stage == 'GROUP-COMPLETE':
+                await tour_db.make_playoff()
+                if tag == 'SL':
+                    await update_post(context.bot, edit_id, tag, season)
+                else:
+                    await make_post(context.bot, await tour_db.get_status())
+            elif stage == 'PLAYOFF-COMPLETE':
+                await make_post(context.bot, await tour_db.get_summary())
 
 async def make_post(bot, post):
     CHANNEL_USERNAME = f"@{CONFIG.get('channel_username')}"
     await bot.send_message(chat_id=CHANNEL_USERNAME, text=post, parse_mode=ParseMode.HTML)  
 
+edit_scheduler = EditScheduler()
+
 async def update_post(bot, edit_id, tag, season) -> None:
     
-    league_db = getLeagueDatabase(tag, season)
+    league_db = await getLeagueDatabase(tag, season)
 
     if tag == 'SL':
-        respond = league_db.get_status()
-        chat_id = league_db.get_metainfo('chat_id')
-        message_id = league_db.get_metainfo('message_id')
-        try:
-            await bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=respond, parse_mode=ParseMode.HTML) 
-        except:
-            pass
-        return       
+        chat_id = await league_db.get_metainfo('chat_id')
+        message_id = await league_db.get_metainfo('message_id')
+    else:
+        chat_id = f"@{CONFIG.get('channel_username')}"
+        message_id = edit_id
 
-    try:
-        new_text = league_db.get_status()
-        CHANNEL_USERNAME = f"@{CONFIG.get('channel_username')}"
-        await bot.edit_message_text(chat_id=CHANNEL_USERNAME, message_id=edit_id, text=new_text, parse_mode=ParseMode.HTML)
-    except:
-        return
+    # The status is rendered when the edit is actually sent, bursts collapse into one edit.
+    edit_scheduler.edit(bot, chat_id, message_id, league_db.get_status, ParseMode.HTML)
     
 def parse_channel_post(text):
     lines = text.splitlines()
@@ -157,15 +173,26 @@ def parse_channel_post(text):
         "season" : season
     }
 
-def parse_bot_request(text):
-    clean_text = re.sub(r'[.,\-]', ' ', text)
-    words = clean_text.split()
+BOT_ADDRESS = re.compile(r'\s*([^\s.,\-]+)[\s.,\-]*(.*)', re.S)
 
+def get_bot_request(text):
+    """Returns the text after the 'бот,' or @bot_username address, None if the message is not for the bot."""
+    match = BOT_ADDRESS.match(text)
+    if not match:
+        return None
+
+    address, request = match.groups()
     BOT_USERNAME = f"@{CONFIG.get('bot_username')}"
-    if words[0].lower() == 'бот' or words[0] == BOT_USERNAME:
-        return words[1:]
+    if address.lower() == 'бот' or address == BOT_USERNAME:
+        return request
     return None
 
+def parse_bot_request(text):
+    request = get_bot_request(text)
+    if request is None:
+        return None
+    return re.sub(r'[.,\-]', ' ', request).split()
+
 async def process_replay(message):
    # Ensure the message is a reply and contains text
     if not message.reply_to_message:
@@ -177,9 +204,9 @@ async def process_replay(message):
     if 'ник' in words:
         print(words)
         try:
-            db = getUsersDatabase()
+            db = await getUsersDatabase()
             user_id = message.reply_to_message.from_user.id
-            user = db.get_user(user_id)
+            user = await db.get_user(user_id)
             respond = (
                 f"@{user['username']}\n"
                 f"никнейм в FC mobile: {user['nick']}\n"
@@ -192,223 +219,252 @@ async def process_replay(message):
             # Log the exception if needed
             print(f"Error fetching user data: {e}")
             return
-        
-def check_pattern(words, pattern):
-    list = pattern.split()
-    lowercased_words = [word.lower() for word in words]
-    for word in list:
-        if word not in lowercased_words:
-            return False
-    return True
-    
 
-async def process_request(message, is_admin):
-    user = message.from_user
 
-    clean_text = re.sub(r'[.,?!\-]', ' ', message.text)
-    words = clean_text.split()[1:]
-    print(words)
-    db = getUsersDatabase()
+common_commands = CommandRouter()
 
-    if check_pattern(words, 'рейтинг лиги'):
-        await message.reply_text(db.get_rating_table())
-        return
-    
-    if check_pattern(words, 'мой рейтинг'):
-        for word in words:
-            try:
-                rating = int(word)        
-                respond = db.update_record(user.id, user.username, 'rate', rating)
-                await message.reply_text(respond)
-                return
-            except ValueError:
-                continue
+@common_commands.command('рейтинг лиги эло')
+async def show_elo_rating(request):
+    db = await getUsersDatabase()
+    ratings = facade_for(await run_blocking(get_ratings, CONFIG.get('database_path')))
+    users = await db.get_all_users()
+    players = [user['ID'] for user in users if user['active'] == 1]
+    await request.message.reply_text(await ratings.get_rating_table(db.target, players))
 
-        await message.reply_text("Не нашел целое число в сообщении")        
-        return
-    
-    if check_pattern(words, 'мой ник'):
-        for word in words:
-            if word.lower() == 'мой' or word.lower() == 'ник':
-                continue
+@common_commands.command('рейтинг лиги')
+async def show_rating(request):
+    db = await getUsersDatabase()
+    await request.message.reply_text(await db.get_rating_table())
 
-            respond = db.update_record(user.id, user.username, 'nick',word)
+@common_commands.command('мой рейтинг')
+async def set_rating(request):
+    message, user = request.message, request.message.from_user
+    db = await getUsersDatabase()
+    for word in request.words:
+        try:
+            rating = int(word)        
+            respond = await db.update_record(user.id, user.username, 'rate', rating)
             await message.reply_text(respond)
             return
+        except ValueError:
+            continue
 
-        await message.reply_text("Не смог записать ник")        
+    await message.reply_text("Не нашел целое число в сообщении")        
+
+@common_commands.command('мой ник')
+async def set_nick(request):
+    message, user = request.message, request.message.from_user
+    db = await getUsersDatabase()
+    for word in request.words:
+        if word.lower() == 'мой' or word.lower() == 'ник':
+            continue
+
+        respond = await db.update_record(user.id, user.username, 'nick',word)
+        await message.reply_text(respond)
         return
-    
+
+    await message.reply_text("Не смог записать ник")        
+
+@common_commands.command('вычеркни рейтинг', admin=True)
+async def remove_from_rating(request):
     pattern = 'вычеркни рейтинг'
-    if check_pattern(words, pattern):
-        if not is_admin:
-            return
+    db = await getUsersDatabase()
+    for word in request.words:
+        if word.lower() in pattern:
+            continue
+        username = word
+        if username[0] == '@':
+            username = username[1:]
 
-        for word in words:
-            if word.lower() in pattern:
-                continue
-            username = word
-            if username[0] == '@':
-                username = username[1:]
+        try:
+            usr = await db.get_user(username, 'username')
+            await db.update_record(usr['ID'], username, 'active',0)
+            await request.message.reply_text(f"Пользователь @{username} вычеркнут из Базы Данных")
+        except KeyError:
+            await request.message.reply_text(f"Пользователь @{username} не найден в Базе Данных")
 
-            try:
-                usr = db.get_user(username, 'username')
-                db.update_record(usr['ID'], username, 'active',0)
-                await message.reply_text(f"Пользователь @{username} вычеркнут из Базы Данных")
-            except KeyError:
-                await message.reply_text(f"Пользователь @{username} не найден в Базе Данных")
-        return
-    
-    if check_pattern(words, 'статус'):
-        await message.reply_text(f"Статус турнира смотри в канале: https://t.me/grandleaguen")
-        return
+@common_commands.command('статус')
+async def show_status_link(request):
+    await request.message.reply_text(f"Статус турнира смотри в канале: https://t.me/grandleaguen")
+
+@common_commands.command('кто не участвует')
+async def show_not_registered(request):
+    db = await getUsersDatabase()
+    users = await db.get_all_users()
+    filtered_users = [user for user in users if user['league'] == '' and user['active'] == 1]
     
-    if check_pattern(words, 'кто не участвует'):
-        filtered_users = [user for user in db.get_all_users() if user['league'] == '' and user['active'] == 1]
-        
-        respond = ''.join(f"@{user['username']} [{user['rate']}]\n" for user in filtered_users)
-        await message.reply_text(respond)
+    respond = ''.join(f"@{user['username']} [{user['rate']}]\n" for user in filtered_users)
+    await request.message.reply_text(respond)
+
+@common_commands.command('история лиги')
+async def show_league_history(request):
+    db = await getUsersDatabase()
+    archive = await getArchive()
+    await request.message.reply_text(await archive.get_history(db.target))
+
+@common_commands.command('моя история')
+async def show_player_history(request):
+    db = await getUsersDatabase()
+    archive = await getArchive()
+    await request.message.reply_text(await archive.get_player_summary(db.target, request.message.from_user.id))
+
+@common_commands.command('личные встречи')
+async def show_head_to_head(request):
+    pattern = 'личные встречи'
+    message = request.message
+    db = await getUsersDatabase()
+    ids = []
+    for word in request.words:
+        if word.lower() in pattern:
+            continue
+        try:
+            usr = await db.get_user(word.lstrip('@'), 'username')
+            ids.append(usr['ID'])
+        except KeyError:
+            await message.reply_text(f"Пользователь {word} не найден в Базе Данных")
+            return
+    if len(ids) == 1:
+        ids.insert(0, message.from_user.id)
+    if len(ids) != 2:
+        await message.reply_text("Укажи одного или двух игроков: 'бот, личные встречи @username'")
         return
-    
 
+    archive = await getArchive()
+    await message.reply_text(await archive.get_head_to_head_summary(db.target, *ids))
+
+async def process_request(message, check_admin):
+    user = message.from_user
+
+    words, lowered = tokenize(message.text)
+    print(words)
+
+    if await common_commands.dispatch(Request(message, words, lowered, check_admin)):
+        return
 
     default_respond = (
         f"Привет, {user.username}! Я понимаю следующие команды:\n\n"
         f"'бот, рейтинг лиги' - выведу участников лиги и их рейтинг в РИ\n\n"
+        f"'бот, рейтинг лиги эло' - рейтинг Эло по всем сыгранным матчам\n\n"
         f"'бот, вычеркни рейтинг @username' - убрать участника из рейтинга лиги (admin)\n\n"
         f"'бот, мой рейтинг 1234' - запишу максимальное кол-во кубков в РИ\n\n"
         f"'бот, мой ник nick' - запишу ник в FC Mobile\n\n"
         f"'бот, кто не участвует' - список игроков, не заявленних ни на один турнир\n\n"
+        f"'бот, история лиги' - призеры всех завершенных сезонов\n\n"
+        f"'бот, моя история' - мои результаты по сезонам\n\n"
+        f"'бот, личные встречи @username' - история матчей с игроком\n\n"
     )
 
     await message.reply_text(default_respond)
     
     
 
-async def reply_in_common_chat(message, is_admin):
+async def reply_in_common_chat(message, check_admin):
     if not message.text:
         return
     
     lower_text = message.text.lower()
     if lower_text.startswith('бот'):
-        await process_request(message, is_admin)
+        await process_request(message, check_admin)
         return
 
     if message.reply_to_message:
         await process_replay(message)
 
-superleague_lists = {}
+superleague_commands = CommandRouter()
 
-async def reply_in_superleague_chat(message, is_admin, is_owner, bot):
-    if not message.text:
+@superleague_commands.command('дебаг', owner=True)
+async def debug_message(request):
+    print(request.message)
+
+@superleague_commands.command('регистрируй', admin=True)
+async def open_registration(request):
+    message, bot = request.message, request.bot
+    channel_post = message.reply_to_message
+    if not channel_post:
         return
-    user = message.from_user
-    registrator = SuperLeagueRegistrator()
-    db = getUsersDatabase()
     
-    lower_text = message.text.lower()
-    if lower_text.startswith('бот'):
-        clean_text = re.sub(r'[.,?!\-]', ' ', message.text)
-        words = clean_text.split()[1:]
-        print(words)
-
-        if is_owner and check_pattern(words, 'дебаг'):
-            print(message)
-            return
+    print(channel_post)
+    sent_message = await bot.send_message(chat_id=message.chat.id, message_thread_id=message.message_thread_id, text=channel_post.text) 
+    
+    store = await getRegistrationStore()
+    await store.open_list(sent_message.id, sent_message.message_thread_id, channel_post.text)
+
+@superleague_commands.command('мои матчи')
+async def show_my_matches(request):
+    SL = await getLeagueDatabase('SL', 1)
+    await request.message.reply_text(await SL.get_user_matches_list(request.message.from_user.id))
+
+@superleague_commands.command('+1')
+async def register_player(request):
+    message, user = request.message, request.message.from_user
+    store = await getRegistrationStore()
+    if not await store.is_open():
+        await message.reply_text("Регистрация не производится!")
+        return
 
-        if is_admin and check_pattern(words, 'регистрируй'):
-            channel_post = message.reply_to_message
-            if not channel_post:
-                return
-            
-            print(channel_post)
-            sent_message = await bot.send_message(chat_id=message.chat.id, message_thread_id=message.message_thread_id, text=channel_post.text) 
-            
-            for key, saved_message in superleague_lists.items():
-                if sent_message.message_thread_id == saved_message.message_thread_id:
-                    del superleague_lists[key]
-                    print(f"removed message with id {key}")
-                    break
-                
-            superleague_lists[sent_message.id] = sent_message   
-            print(f"added message with id {sent_message.id}")  
-            return
+    if user.username is None:
+        await message.reply_text("Установите юзернейм")
+        return
         
-        if check_pattern(words, 'мои матчи'):
-            SL = getLeagueDatabase('SL', 1)
-            await message.reply_text(SL.get_user_matches_list(user.id))
-            return
+    if await store.is_registered(user.username):
+        await message.reply_text("Вы уже зарегистрированы!")
+        return
 
+    slot = await store.register(user.username)
+    if slot is None:
+        await message.reply_text("Регистрация завершена!")
+        return
+    
+    key, line = slot
+    try: 
+        db = await getUsersDatabase()
+        await message.reply_text(f"Участник @{user.username} успешно зарегистрирован!\n{line}")
+        await request.bot.edit_message_text(chat_id=message.chat.id, message_id=key, text=await store.render(key))
+
+        await db.add_user(user.id, user.username)
+    except Exception as e:
+        print(f"[register_player] {e}")
+
+@superleague_commands.command('стартуй', owner=True)
+async def start_superleague(request):
+    message = request.message
+    db = await getUsersDatabase()
+    store = await getRegistrationStore()
+    tour_db = await getLeagueDatabase('SL', 1)
+    groups = [await db.convert_usernames_to_ids(usernames) for usernames in await store.get_groups()]
+    
+    await tour_db.write_group_schedule(groups, 1)
 
-        if check_pattern(words, '+1'):
-            if len(superleague_lists) == 0:
-                await message.reply_text("Регистрация не производится!")
-                return
+    respond = await tour_db.get_status()
+    result_thread_id = int(CONFIG.get('result_thread_id'))
+    sent_message = await request.bot.send_message(chat_id=message.chat.id, message_thread_id=result_thread_id, text=respond, parse_mode=ParseMode.HTML)
+    await tour_db.set_metainfo('message_id', sent_message.id)
+    await tour_db.set_metainfo('chat_id', message.chat.id)
 
-            if user.username is None:
-                await message.reply_text("Установите юзернейм")
-                return
-                
-            keys = []
-            registrated_users = []
-            for key, sent_message in superleague_lists.items():
-                users = registrator.get_all_users(sent_message.text)
-                lines = registrator.extract_lines_with_teams(sent_message.text)
-                registrated_users += users
-
-                if len(users) < len(lines):
-                    keys.append(key)
-
-            print(registrated_users)
-            if user.username in registrated_users:
-                await message.reply_text("Вы уже зарегистрированы!")
-                return
+async def reply_in_superleague_chat(message, check_admin, is_owner, bot):
+    if not message.text:
+        return
+    
+    lower_text = message.text.lower()
+    if lower_text.startswith('бот'):
+        words, lowered = tokenize(message.text)
+        print(words)
 
-            if len(keys) == 0:
-                await message.reply_text("Регистрация завершена!")
-                return
-            
-            key = random.choice(keys) 
-            try: 
-                lines = registrator.extract_lines_with_teams(superleague_lists[key].text)
-                res = registrator.assign_user_to_random_line(lines, user.username)
-                await message.reply_text(res)
-                respond = '\n'.join(lines)
-                sent_message = await bot.edit_message_text(chat_id=message.chat.id, message_id=key, text=respond)
-                superleague_lists[key] = sent_message
-
-                db.add_user(user.id, user.username)
-            except:
-                pass
+        if await superleague_commands.dispatch(Request(message, words, lowered, check_admin, is_owner, bot)):
             return
-        
-        if is_owner and check_pattern(words, 'стартуй'):
-            tour_db = getLeagueDatabase('SL', 1)
-            groups = [[] for _ in range(len(superleague_lists))]
-
-            for index, value in enumerate(superleague_lists.values()):
-                usernames = registrator.get_all_users(value.text)
-                groups[index] = db.convert_usernames_to_ids(usernames)
-            
-            tour_db.write_group_schedule(groups, 1)
-
-            respond = tour_db.get_status()
-            result_thread_id = int(CONFIG.get('result_thread_id'))
-            sent_message = await bot.send_message(chat_id=message.chat.id, message_thread_id=result_thread_id, text=respond, parse_mode=ParseMode.HTML)
-            tour_db.set_metainfo('message_id', sent_message.id)
-            tour_db.set_metainfo('chat_id', message.chat.id)
 
+        db = await getUsersDatabase()
         league_info = {"tag" : 'SL', "season" : 1}
-        words = parse_bot_request(message.text)
-        if words is None:
+        request = get_bot_request(message.text)
+        if request is None:
             return
-        score_processor = ScoreProcessor(words)
+        score_processor = ScoreProcessor(request)
         result = score_processor.get_report()
         if result:
             op_username, score = result
             print(op_username, score)
             try:
-                op_id = db.get_user(op_username,'username')["ID"]
+                op_id = (await db.get_user(op_username,'username'))["ID"]
                 await show_score_confirmation(db, message, op_id, score, 0, league_info)
             except KeyError:
                 await message.reply_text(f'Игрок {op_username} не найден в базе данных')
@@ -420,33 +476,43 @@ async def reply_to_private(message, context):
     if sender_id != int(CONFIG.get('owner_id')):
         return
 
-    EL = getLeagueDatabase('EL', 11)
-    CL = getLeagueDatabase('CL', 11)
+    EL = await getLeagueDatabase('EL', 11)
+    CL = await getLeagueDatabase('CL', 11)
 
     if message.text == 'Го регистрацию':  
-        await make_post(context.bot, CL.get_status())
-        await make_post(context.bot, EL.get_status())
+        await make_post(context.bot, await CL.get_status())
+        await make_post(context.bot, await EL.get_status())
         await message.reply_text("Posted!")
     elif message.text == 'Го турнир':
-        CL.make_groups(7) 
-        EL.make_groups(4)
-        await make_post(context.bot, CL.get_status())
-        await make_post(context.bot, EL.get_status())
+        await CL.make_groups(7) 
+        await EL.make_groups(4)
+        await make_post(context.bot, await CL.get_status())
+        await make_post(context.bot, await EL.get_status())
         await message.reply_text("Posted!")
     elif 'статус' in message.text:
         try:
             season = int(message.text.split()[2])
             tag = 'CL' if 'лч' in message.text else 'EL'
-            CL = getLeagueDatabase(tag, season)
-            await message.reply_html(CL.get_status(True))
+            CL = await getLeagueDatabase(tag, season)
+            await message.reply_html(await CL.get_status(True))
         except Exception as e:
             # Log the exception if needed
             print(f"Error fetching user data: {e}")
     elif message.text == 'обнови суперлигу':
             await update_post(context.bot, None, 'SL', 1)            
+    elif message.text == 'очередь правок':
+        stats = edit_scheduler.get_stats()
+        await message.reply_text('\n'.join(f"{key}: {value}" for key, value in stats.items()))
+    elif message.text == 'медленные апдейты':
+        entries = get_recent_slow_updates()
+        # Newest first, within Telegram's message length limit.
+        respond = '\n\n'.join(reversed(entries))[:4000] if entries else "Медленных апдейтов нет"
+        await message.reply_text(respond)
     else:
         await message.reply_text("Го регистрацию, турнир?")
 
+@track_update('reply_to_comment')
+@profile_update('reply_to_comment')
 async def reply_to_comment(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     message = update.message
     if not message:
@@ -463,20 +529,22 @@ async def reply_to_comment(update: Update, context: ContextTypes.DEFAULT_TYPE) -
         return
 
     chat_id = update.effective_chat.id
-    chat_admins = await context.bot.get_chat_administrators(chat_id)
-    is_admin = any(admin.user.id == sender_id for admin in chat_admins)
+
+    async def check_admin():
+        return await admin_cache.is_admin(context.bot, chat_id, sender_id)
+
     is_owner = (sender_id == int(CONFIG.get('owner_id')))
     channel_post = message.reply_to_message
 
     if message.chat.id == int(CONFIG.get('superleague_group_id')):
         print(f"SL {message.from_user.username}: {message.text}")
-        await reply_in_superleague_chat(message, is_admin, is_owner, context.bot)
+        await reply_in_superleague_chat(message, check_admin, is_owner, context.bot)
         return
 
 
     if message.chat.title == CONFIG.get('group_title'):
         print(f"MAIN {message.from_user.username}: {message.text}")
-        if channel_post and is_admin and message.text.lower() == 'бан':
+        if channel_post and message.text and message.text.lower() == 'бан' and await check_admin():
             try:
                 ban_id = channel_post.from_user.id
                 await context.bot.ban_chat_member(chat_id, ban_id)
@@ -486,7 +554,7 @@ async def reply_to_comment(update: Update, context: ContextTypes.DEFAULT_TYPE) -
                 return
             return
 
-        await reply_in_common_chat(message, is_admin)
+        await reply_in_common_chat(message, check_admin)
         return
 
     if channel_post and channel_post.forward_origin:
@@ -507,41 +575,48 @@ async def reply_to_comment(update: Update, context: ContextTypes.DEFAULT_TYPE) -
         return
 
     print(f"[reply_to_comment] In the channel comments")
-    db = getUsersDatabase()
+    db = await getUsersDatabase()
+
+    if 'шансы' in [word.lower() for word in words]:
+        league = await getLeagueDatabase(league_info['tag'], league_info['season'])
+        await message.reply_text(await league.get_qualification_odds(), parse_mode=ParseMode.HTML)
+        return
 
     if words[0] == '+1':
         if league_info['tag'] == 'CL':
             await message.reply_text(f'Регистрация в ЛЧ недоступна!')
             return
         
-        LE = getLeagueDatabase('EL', league_info['season'])
-        print(LE.get_stage())
-        if LE.get_stage() != 'NOT-STARTED':
+        LE = await getLeagueDatabase('EL', league_info['season'])
+        stage = await LE.get_stage()
+        print(stage)
+        if stage != 'NOT-STARTED':
             await message.reply_text(f'Регистрация завершена!')
             return           
         
         user = message.from_user
         try:         
-            player = db.get_user(user.id)
+            player = await db.get_user(user.id)
             if player['league'] == 'CL':
                 await message.reply_text(f'@{user.username}, ты учавствуешь в ЛЧ!')
                 return
         except KeyError:
             pass
 
-        db.update_record(user.id, user.username, 'league','EL')
+        await db.update_record(user.id, user.username, 'league','EL')
         await update_post(context.bot, origin.message_id, league_info['tag'], league_info['season'])
         await message.reply_text(f'@{user.username}, записал тебя в участники ЛЕ!')
         return 
 
 
-    score_processor = ScoreProcessor(words)
+    # The raw text keeps the "3-1" scores that parse_bot_request splits up.
+    score_processor = ScoreProcessor(get_bot_request(message.text))
     result = score_processor.get_report()
     if result:
         op_username, score = result
         print(op_username, score)
         try:
-            op_id = db.get_user(op_username,'username')["ID"]
+            op_id = (await db.get_user(op_username,'username'))["ID"]
             await show_score_confirmation(db, message, op_id, score, origin.message_id, league_info)
         except KeyError:
             await message.reply_text(f'Игрок {op_username} не найден в базе данных')
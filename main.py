@@ -4,16 +4,20 @@ from telegram.ext import (
     Application, 
     CommandHandler, 
     CallbackQueryHandler, 
+    ChatMemberHandler,
     MessageHandler, 
     filters, 
     ContextTypes)
 from command_handlers import (
     score_confirm_callback,
-    reply_to_comment)
+    reply_to_comment,
+    chat_member_update)
 from utils.config_utils import read_config
 from utils.config_utils import CONFIG
 from utils.tournament_utils import TournamentUtils
 from utils.users_database import UsersDatabaseCSV
+from utils.metered_request import MeteredRequest
+from utils.metrics import start_metrics_server
 
 from command_handlers import getLeagueDatabase
 from command_handlers import getUsersDatabase
@@ -21,9 +25,12 @@ from command_handlers import getUsersDatabase
 
 def init_bot(token):
     print("Starting bot...")
-    application = Application.builder().token(token).build()
+    # Same pool size as the default request; long-polling getUpdates keeps its own, unmetered one.
+    application = Application.builder().token(token).request(MeteredRequest(connection_pool_size=256)).build()
+    start_metrics_server()
     application.add_handler(CallbackQueryHandler(score_confirm_callback, pattern=r'^confirm_(yes|no)_\d+_\d+_\d+_\d+_\d+_(CL|EL|SL)_\d+$')) 
     application.add_handler(MessageHandler(filters.ALL & (~filters.COMMAND), reply_to_comment))
+    application.add_handler(ChatMemberHandler(chat_member_update, ChatMemberHandler.ANY_CHAT_MEMBER))
 
     application.run_polling(allowed_updates=Update.ALL_TYPES)
 
@@ -1,38 +1,48 @@
-class ScoreProcessor:
-    WIN_WORDS = {'выиграл', 'победил', 'обыграл'}
-    LOSE_WORDS = {'проиграл', 'проебал'}
+import functools
+import re
 
-    def __init__(self, words):
-        self.words = words
-        self.result = None
-        self.username = None
-        self.score = None
+WIN_WORDS = ('выиграл', 'победил', 'обыграл', 'переиграл', 'одолел', 'разгромил', 'вынес')
+LOSE_WORDS = ('проиграл', 'проебал', 'уступил', 'слил')
 
-    def parse_result(self, word):
-        """Parses the result word and returns the corresponding result type."""
-        if word in self.WIN_WORDS:
-            return 'WIN'
-        elif word in self.LOSE_WORDS:
-            return 'LOSE'
-        elif 'ничь' in word:
-            return 'DRAW'
-        return None
+# One pass over the text, token by token: an @username, a score ("3:1", "3-1", "3 : 1") or a word.
+REPORT_TOKEN = re.compile(r"""
+    @(?P<username>\w+)
+  | (?P<score>(?<![\w:])(?P<g0>\d{1,3})\s*[:\-–—]\s*(?P<g1>\d{1,3})(?![\w:]))
+  | (?P<word>\w+)
+""", re.VERBOSE)
 
-    def parse_username(self, word):
-        """Parses the username from the word starting with '@'."""
-        if word.startswith('@'):
-            return word[1:]
-        return None
 
-    def parse_score(self, word):
-        """Parses the score from the word containing ':' and returns a tuple of scores."""
-        if ':' in word:
-            try:
-                g0, g1 = map(int, word.split(':'))
-                return (g0, g1)
-            except ValueError:
-                pass
-        return None
+@functools.lru_cache(maxsize=4096)
+def parse_result(word):
+    """Returns 'WIN', 'LOSE' or 'DRAW' for a result word in any case and form, None otherwise."""
+    word = word.lower()
+    if word.startswith(WIN_WORDS):
+        return 'WIN'
+    if word.startswith(LOSE_WORDS):
+        return 'LOSE'
+    if 'ничь' in word or word.startswith('ничейн'):
+        return 'DRAW'
+    return None
+
+
+def parse_report(text):
+    """Returns (username, score) of a match report, the score from the reporter's side, or None."""
+    return ScoreProcessor(text).get_report()
+
+
+def parse_many(texts):
+    """Parses a batch of reports, e.g. a chat backlog; yields parse_report(text) for each."""
+    for text in texts:
+        yield ScoreProcessor(text).get_report()
+
+
+class ScoreProcessor:
+    def __init__(self, text):
+        # Older callers pass the words of the request.
+        self.text = text if isinstance(text, str) else ' '.join(text)
+        self.result = None
+        self.username = None
+        self.score = None
 
     def validate_and_adjust_score(self):
         """Validates and adjusts the score based on the result type."""
@@ -40,7 +50,7 @@ class ScoreProcessor:
             return None
         if self.result != 'DRAW' and self.score[0] == self.score[1]:
             return None
-            
+
         if self.result == 'WIN' and self.score[0] < self.score[1]:
             self.score = (self.score[1], self.score[0])
         if self.result == 'LOSE' and self.score[0] > self.score[1]:
@@ -48,15 +58,22 @@ class ScoreProcessor:
         return self.score
 
     def process_words(self):
-        print(self.words)
-        """Processes the list of words and updates the class attributes."""
-        for word in self.words:
-            if not self.result:
-                self.result = self.parse_result(word)
-            if not self.username:
-                self.username = self.parse_username(word)
-            if not self.score:
-                self.score = self.parse_score(word)
+        """Takes the first result word, username and score of the text, in a single scan."""
+        for token in REPORT_TOKEN.finditer(self.text):
+            kind = token.lastgroup
+            if kind == 'word':
+                if self.result:
+                    continue
+                self.result = parse_result(token.group('word'))
+            elif kind == 'username':
+                if self.username:
+                    continue
+                self.username = token.group('username')
+            elif not self.score:
+                self.score = (int(token.group('g0')), int(token.group('g1')))
+
+            if self.result and self.username and self.score:
+                break
 
     def get_report(self):
         """Processes the words and returns a tuple of username and score if valid."""
@@ -0,0 +1,45 @@
+import time
+
+from utils.config_utils import CONFIG
+from utils.metrics import count_cache
+
+ADMIN_STATUSES = ('administrator', 'creator')
+
+
+class AdminCache:
+    """Administrator IDs per chat, fetched at most once per admin_cache_ttl seconds (default 600)."""
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl
+        self._admins = {}
+
+    def _get_ttl(self):
+        return float(self.ttl if self.ttl is not None else CONFIG.get('admin_cache_ttl', 600))
+
+    async def get_admins(self, bot, chat_id):
+        cached = self._admins.get(chat_id)
+        hit = bool(cached and cached[0] > time.monotonic())
+        count_cache('admins', hit)
+        if hit:
+            return cached[1]
+
+        admins = await bot.get_chat_administrators(chat_id)
+        ids = {admin.user.id for admin in admins}
+        self._admins[chat_id] = (time.monotonic() + self._get_ttl(), ids)
+        return ids
+
+    async def is_admin(self, bot, chat_id, user_id):
+        return user_id in await self.get_admins(bot, chat_id)
+
+    def on_chat_member(self, chat_member):
+        """Applies a ChatMemberUpdated to the cached admins of its chat."""
+        cached = self._admins.get(chat_member.chat.id)
+        if not cached:
+            return
+
+        member = chat_member.new_chat_member
+        if member.status in ADMIN_STATUSES:
+            cached[1].add(member.user.id)
+        else:
+            cached[1].discard(member.user.id)
+        print(f"[on_chat_member] {chat_member.chat.id}: {member.user.id} is {member.status}")
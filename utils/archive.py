@@ -0,0 +1,186 @@
+import sqlite3
+import sys
+import threading
+import time
+
+from utils.group_handler import Item, Match
+from utils.storage import list_leagues
+
+ARCHIVE_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS seasons (
+    league TEXT NOT NULL,
+    season INTEGER NOT NULL,
+    name TEXT,
+    archived REAL,
+    PRIMARY KEY (league, season)
+);
+
+CREATE TABLE IF NOT EXISTS medals (
+    league TEXT NOT NULL,
+    season INTEGER NOT NULL,
+    place INTEGER NOT NULL,
+    player INTEGER NOT NULL,
+    PRIMARY KEY (league, season, place)
+);
+CREATE INDEX IF NOT EXISTS medals_player ON medals(player);
+
+CREATE TABLE IF NOT EXISTS matches (
+    league TEXT NOT NULL,
+    season INTEGER NOT NULL,
+    ID INTEGER NOT NULL,
+    stage TEXT,
+    tag TEXT,
+    id0 INTEGER NOT NULL,
+    id1 INTEGER NOT NULL,
+    g0 INTEGER NOT NULL,
+    g1 INTEGER NOT NULL,
+    PRIMARY KEY (league, season, ID)
+);
+CREATE INDEX IF NOT EXISTS matches_id0 ON matches(id0, id1);
+CREATE INDEX IF NOT EXISTS matches_id1 ON matches(id1, id0);
+'''
+
+MEDALS = ('🥇', '🥈', '🥉')
+
+
+class SeasonArchive:
+    """Medalists and played matches of every finished season, in {path}/archive.db."""
+
+    def __init__(self, path):
+        self.file_path = f'{path}/archive.db'
+        self.connection = sqlite3.connect(self.file_path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.executescript(ARCHIVE_SCHEMA)
+        self._lock = threading.Lock()
+
+    def ingest(self, league):
+        """Archives a finished TournamentUtils season; returns False if it is not finished."""
+        if league.get_stage() != 'PLAYOFF-COMPLETE':
+            return False
+        medalists = league.get_medalists()
+
+        matches = []
+        for row in league.data:
+            match = Match(row['id0'], row['id1'], row['score'])
+            if not match.played:
+                continue
+            matches.append((league.league_tag, league.id, row['ID'], row['stage'], row['tag'],
+                            match.id0, match.id1, *match.score))
+
+        key = (league.league_tag, league.id)
+        with self._lock, self.connection:
+            for table in ('seasons', 'medals', 'matches'):
+                self.connection.execute(f'DELETE FROM {table} WHERE league = ? AND season = ?', key)
+            self.connection.execute('INSERT INTO seasons VALUES (?, ?, ?, ?)', key + (league.name, time.time()))
+            self.connection.executemany(
+                'INSERT INTO medals VALUES (?, ?, ?, ?)',
+                [key + (place, player) for place, player in enumerate(medalists, start=1) if player is not None])
+            self.connection.executemany('INSERT INTO matches VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', matches)
+        print(f"[archive] {league.league_tag}-{league.id}: {len(matches)} matches archived")
+        return True
+
+    def get_medalists(self, player=None):
+        """Returns (league, season, name, place, player) rows, newest season first."""
+        query = ('SELECT medals.league, medals.season, seasons.name, place, player FROM medals '
+                 'JOIN seasons USING (league, season)')
+        args = ()
+        if player is not None:
+            query += ' WHERE player = ?'
+            args = (player,)
+        query += ' ORDER BY medals.season DESC, medals.league, place'
+        return [tuple(row) for row in self.connection.execute(query, args)]
+
+    def get_player_history(self, player):
+        """Returns {(league, season): Item} with the player's record in every archived season."""
+        rows = self.connection.execute(
+            'SELECT league, season, id0, g0, g1 FROM matches WHERE id0 = ? '
+            'UNION ALL SELECT league, season, id0, g0, g1 FROM matches WHERE id1 = ? '
+            'ORDER BY season, league', (player, player))
+        history = {}
+        for row in rows:
+            item = history.setdefault((row['league'], row['season']), Item(player))
+            if row['id0'] == player:
+                item.update(row['g0'], row['g1'])
+            else:
+                item.update(row['g1'], row['g0'])
+        return history
+
+    def get_head_to_head(self, player0, player1):
+        """Returns the archived matches between two players as (league, season, tag, goals0, goals1)."""
+        rows = self.connection.execute(
+            'SELECT league, season, ID, tag, g0, g1 FROM matches WHERE id0 = ? AND id1 = ? '
+            'UNION ALL SELECT league, season, ID, tag, g1, g0 FROM matches WHERE id0 = ? AND id1 = ? '
+            'ORDER BY season, league, ID', (player0, player1, player1, player0))
+        return [(row['league'], row['season'], row['tag'], row['g0'], row['g1']) for row in rows]
+
+    def get_history(self, db):
+        resp = ""
+        seasons = {}
+        for league, season, name, place, player in self.get_medalists():
+            seasons.setdefault((season, league, name), []).append(player)
+        for (season, league, name), players in seasons.items():
+            resp += f"{name}-{season}\n"
+            for medal, username in zip(MEDALS, db.get_usernames(players)):
+                resp += f"{medal} {username}\n"
+            resp += "\n"
+        return resp or "Архив пока пуст"
+
+    def get_player_summary(self, db, player):
+        username = db.get_username_by_id(player)
+        history = self.get_player_history(player)
+        if not history:
+            return f"{username}: в архиве нет сыгранных матчей"
+
+        medals = {(league, season): MEDALS[place - 1]
+                  for league, season, _, place, _ in self.get_medalists(player)}
+        resp = f"История {username} [игры,В-Н-П,голы]\n"
+        for (league, season), item in history.items():
+            medal = medals.get((league, season), '')
+            resp += (f"{league}-{season}: {item.games:2} {item.wins}-{item.draws}-{item.losses} "
+                     f"{item.scored}-{item.conceded} {medal}\n")
+        return resp
+
+    def get_head_to_head_summary(self, db, player0, player1):
+        username0, username1 = db.get_usernames((player0, player1))
+        matches = self.get_head_to_head(player0, player1)
+        if not matches:
+            return f"{username0} и {username1} в архиве не встречались"
+
+        item = Item(player0)
+        resp = ""
+        for league, season, tag, g0, g1 in matches:
+            item.update(g0, g1)
+            resp += f"{league}-{season} {tag}: {username0} {g0}:{g1} {username1}\n"
+        resp += f"\n{username0} {item.wins} - {item.draws} - {item.losses} {username1}"
+        return resp
+
+
+_archives = {}
+
+def get_archive(path):
+    archive = _archives.get(path)
+    if archive is None:
+        archive = SeasonArchive(path)
+        _archives[path] = archive
+    return archive
+
+
+def ingest_seasons(path):
+    """Archives every finished league stored in path."""
+    from utils.tournament_utils import TournamentUtils
+    from utils.users_database import UsersDatabaseCSV
+
+    db = UsersDatabaseCSV(path)
+    archive = get_archive(path)
+    for tag, season in list_leagues(path):
+        league = TournamentUtils(db, path, tag, season)
+        if not archive.ingest(league):
+            print(f"[archive] {tag}-{season}: {league.get_stage()}, skipped")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3 or sys.argv[1] != 'ingest':
+        print("usage: python -m utils.archive ingest <database_path>")
+        sys.exit(1)
+    ingest_seasons(sys.argv[2])
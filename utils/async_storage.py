@@ -0,0 +1,51 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.config_utils import CONFIG
+from utils.profiling import profiled
+
+_executor = None
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        workers = int(CONFIG.get('storage_workers', 4))
+        _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='storage')
+    return _executor
+
+async def run_blocking(func, *args, **kwargs):
+    """Runs func in the storage thread pool so disk work does not block the event loop."""
+    loop = asyncio.get_running_loop()
+    # The caller's context goes along, so the worker's metrics are counted for the update it serves.
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_get_executor(), functools.partial(context.run, profiled(func), *args, **kwargs))
+
+
+class AsyncFacade:
+    """Runs the methods of a storage-backed object in the thread pool, one call at a time; get it from facade_for()."""
+
+    def __init__(self, target):
+        self.target = target
+        self.lock = asyncio.Lock()
+
+    def __getattr__(self, name):
+        attr = getattr(self.target, name)
+        if not callable(attr):
+            return attr
+
+        async def call(*args, **kwargs):
+            async with self.lock:
+                return await run_blocking(attr, *args, **kwargs)
+        return call
+
+
+_facades = {}
+
+def facade_for(target):
+    facade = _facades.get(target)
+    if facade is None:
+        facade = AsyncFacade(target)
+        _facades[target] = facade
+    return facade
@@ -0,0 +1,107 @@
+ROUND_TAGS = {1: 'final', 2: 'semifinal', 4: 'quarter'}
+
+
+def round_tag(matches):
+    """Row tag of a playoff round with the given number of matches."""
+    if matches >= 8:
+        return f"last{matches * 2}"
+    return ROUND_TAGS[matches]
+
+
+def round_matches(tag):
+    """Number of matches in the round with the given tag, None for the third-place match."""
+    for matches, name in ROUND_TAGS.items():
+        if name == tag:
+            return matches
+    if tag.startswith('last') and tag[4:].isdigit():
+        return int(tag[4:]) // 2
+    return None
+
+
+def bracket_size(players):
+    """Smallest power of two that fits the field."""
+    size = 1
+    while size < players:
+        size *= 2
+    return size
+
+
+class BracketNode:
+    """One playoff tie: its rows (legs and replays), where the winner goes and, for semifinals, the loser."""
+
+    __slots__ = ('tag', 'number', 'rows', 'parent', 'loser_to', 'children')
+
+    def __init__(self, tag, number):
+        self.tag = tag
+        self.number = number
+        self.rows = []
+        self.parent = None
+        self.loser_to = None
+        self.children = []
+
+    @property
+    def side(self):
+        """Which player slot, id0 or id1, this tie fills in its parent and third-place tie."""
+        return self.number % 2
+
+
+class Bracket:
+    """Playoff tree over the league rows, ties keyed by (tag, number) as in the rows."""
+
+    def __init__(self):
+        self.nodes = {}
+
+    def node(self, tag, number):
+        node = self.nodes.get((tag, number))
+        if node is not None:
+            return node
+
+        node = BracketNode(tag, number)
+        self.nodes[(tag, number)] = node
+        matches = round_matches(tag)
+        if matches is not None and matches > 1:
+            node.parent = self.node(round_tag(matches // 2), number // 2)
+            node.parent.children.append(node)
+        if tag == 'semifinal':
+            node.loser_to = self.node('third', 0)
+        return node
+
+    def get(self, tag, number):
+        return self.nodes.get((tag, number))
+
+    def node_of(self, row):
+        return self.nodes.get((row['tag'], row['number']))
+
+    def add_row(self, row, after=None):
+        rows = self.node(row['tag'], row['number']).rows
+        if after is not None and after in rows:
+            rows.insert(rows.index(after) + 1, row)
+        else:
+            rows.append(row)
+
+    def layout(self, pairs, legs=2):
+        """Returns the (tag, number, id0, id1) rows of a new bracket; a pair with '' on one side is a bye."""
+        if len(pairs) & (len(pairs) - 1):
+            raise ValueError(f"{len(pairs)} first-round ties do not make a bracket")
+
+        rows = []
+        seated = {}
+        tag = round_tag(len(pairs))
+        for number, (id0, id1) in enumerate(pairs):
+            if id0 != '' and id1 != '':
+                rows += [(tag, number, id0, id1)] * legs
+            else:
+                seated[(number // 2, number % 2)] = id0 if id0 != '' else id1
+
+        byes = len(seated)
+        matches = len(pairs) // 2
+        while matches >= 1:
+            tag = round_tag(matches)
+            for number in range(matches):
+                rows += [(tag, number, seated.pop((number, 0), ''), seated.pop((number, 1), ''))] * legs
+            matches //= 2
+
+        # A bye into the final would leave the third-place tie one player short.
+        if len(pairs) >= 4 or (len(pairs) == 2 and not byes):
+            rows += [('third', 0, '', '')] * legs
+        return rows
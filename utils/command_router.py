@@ -0,0 +1,76 @@
+import re
+
+PUNCTUATION = re.compile(r'[.,?!\-]')
+
+
+def tokenize(text):
+    """Splits a 'бот, ...' message into its words after the address, as given and lower-cased."""
+    words = PUNCTUATION.sub(' ', text).split()[1:]
+    return words, [word.lower() for word in words]
+
+
+class Command:
+    __slots__ = ('pattern', 'words', 'handler', 'admin', 'owner', 'order')
+
+    def __init__(self, pattern, handler, admin, owner, order):
+        self.pattern = pattern
+        self.words = frozenset(pattern.split())
+        self.handler = handler
+        self.admin = admin
+        self.owner = owner
+        self.order = order
+
+
+class Request:
+    """What a handler gets: the message, its words and the caller's permissions."""
+
+    __slots__ = ('message', 'words', 'lowered', 'check_admin', 'is_owner', 'bot')
+
+    def __init__(self, message, words, lowered, check_admin, is_owner=False, bot=None):
+        self.message = message
+        self.words = words
+        self.lowered = lowered
+        self.check_admin = check_admin
+        self.is_owner = is_owner
+        self.bot = bot
+
+
+class CommandRouter:
+    """Routes bot requests to the first registered command whose pattern words are all in the message."""
+
+    def __init__(self):
+        self.commands = []
+        self._index = {}
+
+    def command(self, pattern, admin=False, owner=False):
+        def register(handler):
+            command = Command(pattern, handler, admin, owner, len(self.commands))
+            self.commands.append(command)
+            self._index.setdefault(pattern.split()[0], []).append(command)
+            return handler
+        return register
+
+    def match(self, lowered, is_owner=False):
+        """Returns the first registered command matching the lower-cased words, or None."""
+        present = set(lowered)
+        candidates = []
+        for word in present:
+            candidates += self._index.get(word, ())
+        if len(candidates) > 1:
+            candidates.sort(key=lambda command: command.order)
+        for command in candidates:
+            if command.owner and not is_owner:
+                continue
+            if command.words <= present:
+                return command
+        return None
+
+    async def dispatch(self, request):
+        """Runs the matching handler; returns False when no command matched."""
+        command = self.match(request.lowered, request.is_owner)
+        if command is None:
+            return False
+        if command.admin and not await request.check_admin():
+            return True
+        await command.handler(request)
+        return True
@@ -1,45 +1,144 @@
 import random
+from collections import deque
+
+
+def separate(keys):
+    """Rule keeping apart players with the same key, e.g. {player: group} or {player: country}."""
+    def rule(a, b):
+        key = keys.get(a)
+        return key is not None and key == keys.get(b)
+    return rule
+
 
 class Drawer:
-    def __init__(self):
-        pass
+    """Group and playoff draws under separation rules; past rejection sampling the fallback is a sequential pick, not exactly uniform."""
+
+    REJECTIONS = 20
+    ATTEMPTS = 100
+
+    def __init__(self, seed=None, rules=()):
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.random = random.Random(self.seed)
+        self.rules = list(rules)
 
     def draw_one_and_remove(self, elems):
-        choice = random.choice(list(elems))
-        elems.remove(choice)
-        return choice
+        index = self.random.randrange(len(elems))
+        elems[index], elems[-1] = elems[-1], elems[index]
+        return elems.pop()
 
     def split_list(self, lst, n):
         return [lst[i:i + n] for i in range(0, len(lst), n)]
 
+    def conflicts(self, a, b):
+        return any(rule(a, b) for rule in self.rules)
+
     def make_group_draw(self, ids, number_of_groups):
-        pots = self.split_list(ids, number_of_groups)
-        pots = [set(pot) for pot in pots]
-        groups = [[] for _ in range(number_of_groups)]
+        """Draws pots of number_of_groups players each, in the order of ids, into the groups."""
+        return self.draw_groups(self.split_list(ids, number_of_groups), number_of_groups)
+
+    def draw_groups(self, pots, number_of_groups):
+        """Puts one player of every pot into each group; a short pot fills the first groups."""
+        for _ in range(self.REJECTIONS):
+            groups = [[] for _ in range(number_of_groups)]
+            for pot in pots:
+                pot = list(pot)
+                for i in range(len(pot)):
+                    groups[i].append(self.draw_one_and_remove(pot))
+            if all(not self.conflicts(a, b) for group in groups for i, a in enumerate(group) for b in group[:i]):
+                return groups
 
-        for pot in pots:
-            for i in range(len(pot)):
-                groups[i % number_of_groups].append(self.draw_one_and_remove(pot))
-        return groups
+        for _ in range(self.ATTEMPTS):
+            groups = [[] for _ in range(number_of_groups)]
+            for pot in pots:
+                allowed = lambda player, index: not any(self.conflicts(player, other) for other in groups[index])
+                assignment = self.assign(pot, range(len(pot)), allowed)
+                if assignment is None:
+                    break
+                for player, index in assignment:
+                    groups[index].append(player)
+            else:
+                return groups
+        raise ValueError('No group draw satisfies the rules')
 
     def make_playoff_draw(self, listA, listB):
-        pairs = []
-        blockers = dict(zip(listA, listB))
-        setA = set(listA)
-        setB = set(listB)
-
-        while setA:
-            A = self.draw_one_and_remove(setA)
-            B = self.draw_one_and_remove(setB)
-
-            if blockers.get(A) == B and setB:
-                B = self.draw_one_and_remove(setB)
-                setB.add(blockers[A])
-            
-            pairs.append([A, B])
-
-        if pairs and blockers.get(pairs[-1][0]) == pairs[-1][1]:
-            if len(pairs) > 1:
-                pairs[-1][1], pairs[-2][1] = pairs[-2][1], pairs[-1][1]
-
-        return pairs
+        """Pairs every player of listA with one of listB."""
+        for _ in range(self.REJECTIONS):
+            B = list(listB)
+            pairs = [[A, self.draw_one_and_remove(B)] for A in self.random.sample(listA, len(listA))]
+            if not any(self.conflicts(A, B) for A, B in pairs):
+                return pairs
+
+        assignment = self.assign(listA, listB, lambda A, B: not self.conflicts(A, B))
+        if assignment is None:
+            raise ValueError('No playoff draw satisfies the rules')
+        return [[A, B] for A, B in assignment]
+
+    def assign(self, players, slots, allowed):
+        """Gives each player, in random order, a random allowed slot that leaves the rest placeable."""
+        slots = list(slots)
+        options = {player: [slot for slot in slots if allowed(player, slot)] for player in players}
+        slot_of, player_of = {}, {}
+        for player in players:
+            if not self._augment(player, options, slot_of, player_of, set()):
+                return None
+
+        drawn = []
+        fixed = set()
+        order = list(players)
+        self.random.shuffle(order)
+        for player in order:
+            candidates = [slot for slot in options[player] if slot not in fixed]
+            self.random.shuffle(candidates)
+            for slot in candidates:
+                if self._move(player, slot, options, slot_of, player_of, fixed):
+                    break
+            fixed.add(slot_of[player])
+            drawn.append((player, slot_of[player]))
+        return drawn
+
+    def _move(self, player, slot, options, slot_of, player_of, fixed):
+        """Re-routes the assignment so that player gets slot, if the others can still be placed."""
+        if slot_of[player] == slot:
+            return True
+        holder = player_of.get(slot)
+        old = slot_of.pop(player)
+        del player_of[old]
+        if holder is not None:
+            del slot_of[holder]
+        slot_of[player] = slot
+        player_of[slot] = player
+        if holder is None or self._augment(holder, options, slot_of, player_of, fixed | {slot}):
+            return True
+
+        # Undo: the holder keeps the slot and the player goes back.
+        del slot_of[player]
+        player_of[slot] = holder
+        slot_of[holder] = slot
+        slot_of[player] = old
+        player_of[old] = player
+        return False
+
+    def _augment(self, start, options, slot_of, player_of, blocked):
+        """Finds a free slot for start by shifting other players along an augmenting path (BFS)."""
+        parent = {}
+        queue = deque([start])
+        seen = set(blocked)
+        while queue:
+            player = queue.popleft()
+            for slot in options[player]:
+                if slot in seen:
+                    continue
+                seen.add(slot)
+                parent[slot] = player
+                holder = player_of.get(slot)
+                if holder is None:
+                    while True:
+                        owner = parent[slot]
+                        previous = slot_of.get(owner)
+                        slot_of[owner] = slot
+                        player_of[slot] = owner
+                        if owner == start:
+                            return True
+                        slot = previous
+                queue.append(holder)
+        return False
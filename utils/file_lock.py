@@ -0,0 +1,45 @@
+import functools
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class FileLock:
+    """Re-entrant advisory file lock, shared by the threads of this process and by other bot processes."""
+
+    def __init__(self, path):
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            self._file = open(self.path, mode='a')
+            if fcntl:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        self._depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._depth -= 1
+        if self._depth == 0:
+            if fcntl:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+        self._thread_lock.release()
+
+
+def locked(method):
+    """Runs a method of a storage-backed object under its storage lock, on refreshed data."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.storage.lock:
+            self.refresh()
+            return method(self, *args, **kwargs)
+    return wrapper
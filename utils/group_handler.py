@@ -1,17 +1,25 @@
-def print_group(db, items, title = '', split_after = None):
+from utils.qualification import qualification_status, CLINCHED, ELIMINATED
+
+QUALIFICATION_MARKS = {CLINCHED: ' ✓', ELIMINATED: ' ✗'}
+
+def print_group(db, items, title = '', split_after = None, marks = None):
 
     delim = '-'*26
     result = f"● {title} [игры,очки,голы]\n{delim}\n"
-    for num, item in enumerate(items, start=1):
+    usernames = db.get_usernames([item.id for item in items])
+    for num, (item, username) in enumerate(zip(items, usernames), start=1):
         diff = f"{item.scored}-{item.conceded}"
-        username = db.get_username_by_id(item.id)[:14]
-        result += f"{num:2} {username:14}{item.games:2}{item.points:3} {diff}\n" 
+        username = username[:14]
+        mark = marks.get(item.id, '') if marks else ''
+        result += f"{num:2} {username:14}{item.games:2}{item.points:3} {diff}{mark}\n" 
         if num == split_after:
             result += f"{delim}\n"
 
     return result   
 
 class Match:
+    __slots__ = ('id0', 'id1', 'played', 'score')
+
     def __init__(self, player0, player1, score):
         self.id0 = player0
         self.id1 = player1
@@ -28,13 +36,14 @@ class Match:
             pass
 
     def to_string(self, db): 
-        player0 = db.get_username_by_id(self.id0)
-        player1 = db.get_username_by_id(self.id1)
+        player0, player1 = db.get_usernames((self.id0, self.id1))
         if self.played:
             return f"{player0} {self.score[0]}:{self.score[1]} {player1}"
         return f"{player0} - {player1}"
 
 class Item:
+    __slots__ = ('id', 'games', 'wins', 'draws', 'losses', 'scored', 'conceded', 'points')
+
     def __init__(self, id):
         self.id = id
         self.games = 0
@@ -60,34 +69,68 @@ class Item:
             self.losses += 1
         
 class Group:
+    """Group matches plus standings that are kept up to date result by result."""
+
+    __slots__ = ('name', 'matches', 'items', 'standings', '_sorted', 'users', '_qualification')
+
     def __init__(self, name):
         self.name = name
         self.matches = []
         self.items = []
+        self.standings = {}
+        self._sorted = True
         self.users = set()
+        self._qualification = {}
 
     def append_match(self, team1, team2, score = ""):
-       self.matches.append(Match(team1, team2, score)) 
+       match = Match(team1, team2, score)
+       self.matches.append(match) 
        self.users.add(team1)
        self.users.add(team2)
+       self.standings.setdefault(team1, Item(team1))
+       self.standings.setdefault(team2, Item(team2))
+       self._sorted = False
+       self._qualification = {}
+       if match.played:
+           self._apply(match)
+       return match
+
+    def _apply(self, match):
+        self.standings[match.id0].update(*match.score)
+        self.standings[match.id1].update(*reversed(match.score))
+        self._sorted = False
+        self._qualification = {}
+
+    def record_score(self, match, score):
+        """Applies one new result of match to the standings."""
+        match.played = True
+        match.score = score
+        self._apply(match)
 
     def get_users(self):
         return self.users
 
-    def compute_table(self, db, add_results=True):
-        items = {}
-
-        for match in self.matches:
-            items.setdefault(match.id0, Item(match.id0))
-            items.setdefault(match.id1, Item(match.id1))
-            if match.played:
-                items[match.id0].update(*match.score)
-                items[match.id1].update(*reversed(match.score))
-
-        self.items = sorted(items.values(), key=lambda x: (x.points, (x.scored - x.conceded), x.scored), reverse=True)
-
+    def get_table(self):
+        """Returns the standings sorted by points, goal difference and goals, re-sorting only after changes."""
+        if not self._sorted:
+            self.items = sorted(self.standings.values(), key=lambda x: (x.points, (x.scored - x.conceded), x.scored), reverse=True)
+            self._sorted = True
+        return self.items
+
+    def get_qualification(self, clinch_places, alive_places):
+        """Clinched/eliminated/alive per player, recomputed only after the group changes."""
+        key = (clinch_places, alive_places)
+        if key not in self._qualification:
+            self._qualification[key] = qualification_status(self, clinch_places, alive_places)
+        return self._qualification[key]
+
+    def compute_table(self, db, add_results=True, places=None):
         title = f"Group {self.name}"
-        result = print_group(db, self.items, title)
+        marks = None
+        if places:
+            status = self.get_qualification(*places)
+            marks = {player: QUALIFICATION_MARKS.get(value, '') for player, value in status.items()}
+        result = print_group(db, self.get_table(), title, marks=marks)
 
         if add_results:
             result += '\n' + self.get_matches_list(db)
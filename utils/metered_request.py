@@ -0,0 +1,23 @@
+import time
+
+from telegram.request import HTTPXRequest
+
+from utils.metrics import BOT_API_ERRORS, BOT_API_SECONDS
+
+
+class MeteredRequest(HTTPXRequest):
+    """HTTPXRequest that times every Bot API call by method and counts the failed ones."""
+
+    async def do_request(self, url, method, *args, **kwargs):
+        api_method = url.rsplit('/', 1)[-1]
+        start = time.perf_counter()
+        try:
+            code, payload = await super().do_request(url, method, *args, **kwargs)
+        except Exception:
+            BOT_API_ERRORS.inc(method=api_method)
+            raise
+        finally:
+            BOT_API_SECONDS.observe(time.perf_counter() - start, method=api_method)
+        if code >= 400:
+            BOT_API_ERRORS.inc(method=api_method)
+        return code, payload
@@ -0,0 +1,198 @@
+import bisect
+import contextvars
+import functools
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils.config_utils import CONFIG
+
+SECONDS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+
+class Counter:
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.type = 'counter'
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels):
+        return self._values.get(tuple(sorted(labels.items())), 0)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in sorted(self._values.items())]
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense; one series per label set."""
+
+    def __init__(self, name, help, buckets=SECONDS_BUCKETS):
+        self.name = name
+        self.help = help
+        self.type = 'histogram'
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0, 0]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def get(self, **labels):
+        """Returns (count, sum) of a series."""
+        series = self._series.get(tuple(sorted(labels.items())))
+        return (series[2], series[1]) if series else (0, 0)
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket in zip(self.buckets, counts):
+                    cumulative += bucket
+                    samples.append((f'{self.name}_bucket', key + (('le', bound),), cumulative))
+                samples.append((f'{self.name}_bucket', key + (('le', '+Inf'),), count))
+                samples.append((f'{self.name}_sum', key, total))
+                samples.append((f'{self.name}_count', key, count))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def _register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help):
+        return self._register(Counter(name, help))
+
+    def histogram(self, name, help, buckets=SECONDS_BUCKETS):
+        return self._register(Histogram(name, help, buckets))
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{_format_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+HANDLER_SECONDS = REGISTRY.histogram('bot_handler_seconds', 'Time spent handling one update, by handler.')
+HANDLER_ERRORS = REGISTRY.counter('bot_handler_errors_total', 'Updates whose handler raised, by handler.')
+STORAGE_SECONDS = REGISTRY.histogram('bot_storage_seconds', 'Time spent in storage operations, by operation.')
+BOT_API_SECONDS = REGISTRY.histogram('bot_api_seconds', 'Time spent in outbound Bot API calls, by method.')
+BOT_API_ERRORS = REGISTRY.counter('bot_api_errors_total', 'Bot API calls that failed or got an error status, by method.')
+FILE_PARSES = REGISTRY.counter('bot_file_parses_total', 'Full loads of a league or the users from storage, by kind.')
+PARSES_PER_UPDATE = REGISTRY.histogram('bot_file_parses_per_update', 'Full storage loads caused by one update, by handler.',
+                                       COUNT_BUCKETS)
+CACHE_REQUESTS = REGISTRY.counter('bot_cache_requests_total', 'Cache lookups, by cache and result (hit or miss).')
+
+# Counts of the update being handled; storage work in the thread pool sees it too (run_blocking copies the context).
+_update = contextvars.ContextVar('metrics_update', default=None)
+
+
+def track_update(handler_name):
+    """Decorates an async update handler: times it and counts the file parses it causes."""
+    def decorate(handler):
+        @functools.wraps(handler)
+        async def wrapper(*args, **kwargs):
+            counts = {'parses': 0}
+            token = _update.set(counts)
+            start = time.perf_counter()
+            try:
+                return await handler(*args, **kwargs)
+            except Exception:
+                HANDLER_ERRORS.inc(handler=handler_name)
+                raise
+            finally:
+                _update.reset(token)
+                HANDLER_SECONDS.observe(time.perf_counter() - start, handler=handler_name)
+                PARSES_PER_UPDATE.observe(counts['parses'], handler=handler_name)
+        return wrapper
+    return decorate
+
+
+def timed(operation):
+    """Decorates a blocking storage operation to be timed under bot_storage_seconds."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                STORAGE_SECONDS.observe(time.perf_counter() - start, operation=operation)
+        return wrapper
+    return decorate
+
+
+def count_parse(kind):
+    FILE_PARSES.inc(kind=kind)
+    counts = _update.get()
+    if counts is not None:
+        counts['parses'] += 1
+
+
+def count_cache(cache, hit):
+    CACHE_REQUESTS.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port=None, host='127.0.0.1'):
+    """Serves /metrics on a local port (metrics_port in config.txt, 9108 by default, 0 to turn off)."""
+    port = int(port if port is not None else CONFIG.get('metrics_port', 9108))
+    if not port:
+        return None
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        print(f"[metrics] cannot listen on {host}:{port}: {e}")
+        return None
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    print(f"[metrics] serving http://{host}:{port}/metrics")
+    return server
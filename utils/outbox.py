@@ -0,0 +1,140 @@
+import asyncio
+import contextvars
+import time
+
+from telegram.error import BadRequest, RetryAfter, TelegramError
+
+from utils.config_utils import CONFIG
+
+
+class TokenBucket:
+    """Allows `rate` sends per second on average with bursts of up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0
+
+    def _fill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self):
+        now = time.monotonic()
+        self._fill(now)
+        wait = max(0, self.blocked_until - now)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def take(self):
+        self._fill(time.monotonic())
+        self.tokens -= 1
+
+    def block(self, seconds):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+class EditScheduler:
+    """Outbound edit_message_text queue: keeps the latest edit of each message and rate-limits every chat."""
+
+    MAX_ATTEMPTS = 4
+
+    def __init__(self, rate_per_minute=None, burst=None):
+        self.rate_per_minute = rate_per_minute
+        self.burst = burst
+        self._pending = {}
+        self._buckets = {}
+        self._worker = None
+        self._wakeup = None
+        self.enqueued = 0
+        self.coalesced = 0
+        self.sent = 0
+        self.failed = 0
+
+    def _bucket(self, chat_id):
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            rate = float(self.rate_per_minute or CONFIG.get('edit_rate_per_minute', 20)) / 60
+            burst = int(self.burst or CONFIG.get('edit_burst', 3))
+            bucket = TokenBucket(rate, burst)
+            self._buckets[chat_id] = bucket
+        return bucket
+
+    def edit(self, bot, chat_id, message_id, text, parse_mode=None):
+        """Queues an edit; text is a string or an async callable returning one."""
+        key = (chat_id, message_id)
+        self.enqueued += 1
+        if key in self._pending:
+            self.coalesced += 1
+        self._pending[key] = (bot, text, parse_mode, 0)
+
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        self._wakeup.set()
+        if self._worker is None or self._worker.done():
+            # A fresh context: the worker outlives the update that started it and must not
+            # count its renders into that update's metrics or profile.
+            self._worker = contextvars.Context().run(asyncio.create_task, self._run())
+
+    def get_stats(self):
+        return {
+            'enqueued': self.enqueued,
+            'coalesced': self.coalesced,
+            'sent': self.sent,
+            'failed': self.failed,
+            'pending': len(self._pending),
+        }
+
+    async def _run(self):
+        while self._pending:
+            key = min(self._pending, key=lambda key: self._bucket(key[0]).wait_time())
+            wait = self._bucket(key[0]).wait_time()
+            if wait > 0:
+                # Edits queued while we wait replace the pending text or may be for a free chat.
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            bot, text, parse_mode, attempt = self._pending.pop(key)
+            self._bucket(key[0]).take()
+            await self._send(key, bot, text, parse_mode, attempt)
+
+    async def _send(self, key, bot, text, parse_mode, attempt):
+        chat_id, message_id = key
+        try:
+            rendered = await text() if callable(text) else text
+            await bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=rendered, parse_mode=parse_mode)
+            self.sent += 1
+            print(f"[EditScheduler] edited {key}, {self.sent} sent, {self.coalesced} coalesced")
+        except RetryAfter as e:
+            retry_after = e.retry_after
+            if hasattr(retry_after, 'total_seconds'):
+                retry_after = retry_after.total_seconds()
+            print(f"[EditScheduler] flood limit on {chat_id}, retry in {retry_after}s")
+            self._bucket(chat_id).block(retry_after)
+            self._retry(key, bot, text, parse_mode, attempt)
+        except BadRequest as e:
+            if 'not modified' not in str(e):
+                self.failed += 1
+                print(f"[EditScheduler] edit of {key} rejected: {e}")
+        except TelegramError as e:
+            print(f"[EditScheduler] edit of {key} failed: {e}")
+            self._bucket(chat_id).block(2 ** attempt)
+            self._retry(key, bot, text, parse_mode, attempt)
+        except Exception as e:
+            self.failed += 1
+            print(f"[EditScheduler] could not render edit of {key}: {e}")
+
+    def _retry(self, key, bot, text, parse_mode, attempt):
+        if attempt + 1 >= self.MAX_ATTEMPTS:
+            self.failed += 1
+            print(f"[EditScheduler] giving up on {key}")
+            return
+        # A newer edit queued meanwhile wins over the retried one.
+        self._pending.setdefault(key, (bot, text, parse_mode, attempt + 1))
@@ -0,0 +1,161 @@
+import collections
+import contextvars
+import cProfile
+import functools
+import io
+import itertools
+import logging
+import logging.handlers
+import pstats
+import sys
+import threading
+import time
+
+from utils.config_utils import CONFIG
+
+# Profiles of the update being handled: the event loop's one and one per thread-pool call.
+_session = contextvars.ContextVar('profile_session', default=None)
+# One update is profiled at a time. From 3.12 cProfile runs on sys.monitoring: a single
+# profiler per process, which already sees every thread, so thread-pool calls get no own profile.
+_profile_lock = threading.Lock()
+_THREAD_PROFILES = sys.version_info < (3, 12)
+_updates = itertools.count()
+_recent = collections.deque(maxlen=20)
+_logger = None
+
+
+def get_mode():
+    """profile_mode in config.txt: off (default), slow (slow-update log only), sample or full."""
+    return CONFIG.get('profile_mode', 'off')
+
+
+def _get_logger():
+    global _logger
+    if _logger is None:
+        path = CONFIG.get('slow_log_path') or f"{CONFIG.get('database_path', '.')}/slow_updates.log"
+        handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=int(CONFIG.get('slow_log_max_bytes', 1024 * 1024)),
+            backupCount=int(CONFIG.get('slow_log_backups', 3)), encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        _logger = logging.getLogger('bot.slow_updates')
+        _logger.propagate = False
+        _logger.addHandler(handler)
+        _logger.setLevel(logging.INFO)
+    return _logger
+
+
+def _enable(profile):
+    try:
+        profile.enable()
+        return True
+    except ValueError as e:
+        # Another profiler or debugger is active; the update runs unprofiled.
+        print(f"[profiling] not profiled: {e}")
+        return False
+
+
+def _start_profile():
+    """A running Profile, or None if another update is being profiled."""
+    if not _profile_lock.acquire(blocking=False):
+        return None
+    profile = cProfile.Profile()
+    if not _enable(profile):
+        _profile_lock.release()
+        return None
+    return profile
+
+
+def _stop_profile(profile):
+    profile.disable()
+    _profile_lock.release()
+
+
+def profiled(func):
+    """Wraps blocking work so it is profiled into the current update's session, if there is one."""
+    session = _session.get()
+    if session is None or not _THREAD_PROFILES:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profile = cProfile.Profile()
+        if not _enable(profile):
+            return func(*args, **kwargs)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.disable()
+            session.append(profile)
+    return wrapper
+
+
+def describe_update(update):
+    """(update type, chat, command) of a telegram Update, for the slow-log."""
+    kind = next((name for name in ('callback_query', 'message', 'chat_member', 'my_chat_member')
+                 if getattr(update, name, None) is not None), type(update).__name__)
+    chat = getattr(update, 'effective_chat', None)
+    chat = f"{chat.id} {chat.title or chat.username or ''}".strip() if chat else '-'
+    if kind == 'callback_query':
+        command = update.callback_query.data
+    elif kind == 'message':
+        command = update.message.text or '-'
+    else:
+        command = '-'
+    return kind, chat, command[:80].replace('\n', ' ')
+
+
+def format_profile(profiles, top=None):
+    """Top-N functions by cumulative time over all profiles of one update."""
+    stream = io.StringIO()
+    stats = pstats.Stats(*profiles, stream=stream)
+    stats.sort_stats('cumulative').print_stats(int(top or CONFIG.get('profile_top', 15)))
+    lines = stream.getvalue().splitlines()
+    # Skip the pstats preamble up to the column header.
+    start = next((index for index, line in enumerate(lines) if line.lstrip().startswith('ncalls')), 0)
+    return '\n'.join(line for line in lines[start:] if line.strip())
+
+
+def record_slow_update(handler_name, update, elapsed, profiles):
+    kind, chat, command = describe_update(update)
+    entry = f"{handler_name} {elapsed * 1000:.0f} ms, {kind}, chat {chat}, command {command!r}"
+    if profiles:
+        entry += '\n' + format_profile(profiles)
+    _recent.append(entry)
+    try:
+        _get_logger().info(entry)
+    except OSError as e:
+        print(f"[profiling] slow-log not written: {e}")
+
+
+def get_recent_slow_updates():
+    return list(_recent)
+
+
+def profile_update(handler_name):
+    """Decorates an async update handler: slow-logs it and, per profile_mode, profiles it."""
+    def decorate(handler):
+        @functools.wraps(handler)
+        async def wrapper(update, *args, **kwargs):
+            mode = get_mode()
+            if mode not in ('slow', 'sample', 'full'):
+                return await handler(update, *args, **kwargs)
+
+            number = next(_updates)
+            profile = None
+            if mode == 'full' or (mode == 'sample' and number % int(CONFIG.get('profile_sample_every', 10)) == 0):
+                profile = _start_profile()
+            profiles = []
+            token = _session.set(profiles if profile else None)
+            start = time.perf_counter()
+            try:
+                return await handler(update, *args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                _session.reset(token)
+                if profile:
+                    _stop_profile(profile)
+                    profiles.insert(0, profile)
+                if elapsed * 1000 >= float(CONFIG.get('slow_update_ms', 1000)):
+                    record_slow_update(handler_name, update, elapsed, profiles)
+        return wrapper
+    return decorate
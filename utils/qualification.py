@@ -0,0 +1,128 @@
+import itertools
+from collections import deque
+
+CLINCHED = 'clinched'
+ELIMINATED = 'eliminated'
+ALIVE = 'alive'
+
+
+def max_flow(capacity, source, sink):
+    """Edmonds-Karp on a {node: {node: capacity}} graph; returns the value of the maximum flow."""
+    residual = {}
+    for u, edges in capacity.items():
+        for v, cap in edges.items():
+            residual.setdefault(u, {})[v] = residual.get(u, {}).get(v, 0) + cap
+            residual.setdefault(v, {}).setdefault(u, 0)
+
+    flow = 0
+    while True:
+        parent = {source: None}
+        queue = deque([source])
+        while queue and sink not in parent:
+            u = queue.popleft()
+            for v, cap in residual.get(u, {}).items():
+                if cap > 0 and v not in parent:
+                    parent[v] = u
+                    queue.append(v)
+        if sink not in parent:
+            return flow
+
+        path = []
+        v = sink
+        while parent[v] is not None:
+            path.append((parent[v], v))
+            v = parent[v]
+        push = min(residual[u][v] for u, v in path)
+        for u, v in path:
+            residual[u][v] -= push
+            residual[v][u] += push
+        flow += push
+
+
+def _distributable(matches, points_per_match, limits):
+    """Max points that matches can hand out when every player p takes at most limits[p]."""
+    capacity = {'source': {}}
+    for index, (id0, id1) in enumerate(matches):
+        capacity['source'][('match', index)] = points_per_match
+        capacity[('match', index)] = {('player', id0): points_per_match, ('player', id1): points_per_match}
+    for player, limit in limits.items():
+        capacity[('player', player)] = {'sink': limit}
+    return max_flow(capacity, 'source', 'sink')
+
+
+class _Table:
+    def __init__(self, group):
+        self.players = list(group.standings)
+        self.points = {player: item.points for player, item in group.standings.items()}
+        # Equal records keep standings order in get_table's stable sort, hence the position.
+        self.keys = {player: (item.points, item.scored - item.conceded, item.scored, -position)
+                     for position, (player, item) in enumerate(group.standings.items())}
+        self.remaining = [(match.id0, match.id1) for match in group.matches if not match.played]
+        self.left = {player: 0 for player in self.players}
+        for id0, id1 in self.remaining:
+            self.left[id0] += 1
+            self.left[id1] += 1
+
+    def settled_ahead(self, player, other):
+        """True if both are done and other's final record ranks it above player, None if not both done."""
+        if self.left[player] or self.left[other]:
+            return None
+        return self.keys[other] > self.keys[player]
+
+    def can_be_passed(self, player, count):
+        """Can `count` others finish level with or above player, who loses every match left? False is certain."""
+        floor = self.points[player]
+        others = [other for other in self.players if other != player]
+        for chasers in itertools.combinations(others, count):
+            chasers = set(chasers)
+            internal, deficits = [], {}
+            for other in chasers:
+                target = floor
+                if self.settled_ahead(player, other) is False:
+                    target = floor + 1
+                deficits[other] = target - self.points[other]
+            for id0, id1 in self.remaining:
+                if id0 in chasers and id1 in chasers:
+                    internal.append((id0, id1))
+                else:
+                    # A chaser wins every match against the rest of the group.
+                    for other in (id0, id1):
+                        if other in chasers:
+                            deficits[other] -= 3
+            deficits = {other: max(0, deficit) for other, deficit in deficits.items()}
+            if _distributable(internal, 3, deficits) >= sum(deficits.values()):
+                return True
+        return False
+
+    def can_finish_in(self, player, places):
+        """Can player, winning every match left, end with fewer than `places` others above it? False is certain."""
+        ceiling = self.points[player] + 3 * self.left[player]
+        others = [other for other in self.players if other != player]
+        for ahead in itertools.combinations(others, places - 1):
+            behind = [other for other in others if other not in ahead]
+            slack = {}
+            for other in behind:
+                limit = ceiling - 1 if self.settled_ahead(player, other) else ceiling
+                slack[other] = limit - self.points[other]
+            if any(value < 0 for value in slack.values()):
+                continue
+            # Everybody kept behind loses to the player and to the players allowed ahead.
+            internal = [(id0, id1) for id0, id1 in self.remaining if id0 in slack and id1 in slack]
+            if _distributable(internal, 2, slack) == 2 * len(internal):
+                return True
+        return False
+
+
+def qualification_status(group, clinch_places, alive_places):
+    """Returns {player: CLINCHED | ELIMINATED | ALIVE} for a Group; anything not certain is ALIVE."""
+    table = _Table(group)
+    size = len(table.players)
+    status = {}
+    for player in table.players:
+        if clinch_places >= size or (clinch_places > 0 and not table.can_be_passed(player, clinch_places)):
+            status[player] = CLINCHED
+        elif alive_places < size and (alive_places == 0 or not table.can_finish_in(player, alive_places)):
+            status[player] = ELIMINATED
+        else:
+            status[player] = ALIVE
+    return status
@@ -0,0 +1,133 @@
+import threading
+
+from utils.config_utils import CONFIG
+from utils.group_handler import Match
+from utils.storage import list_leagues, open_league_storage
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def _result(g0, g1):
+    if g0 > g1:
+        return 1.0
+    if g0 == g1:
+        return 0.5
+    return 0.0
+
+
+class EloRatings:
+    """Elo rating of every player computed from played matches (elo_k and elo_base in config.txt)."""
+
+    def __init__(self, k=None, base=None):
+        self.k = float(k or CONFIG.get('elo_k', 32))
+        self.base = float(base or CONFIG.get('elo_base', 1500))
+        self.ratings = {}
+        self.games = {}
+        self._lock = threading.Lock()
+
+    def get(self, player):
+        return self.ratings.get(player, self.base)
+
+    def update(self, id0, id1, g0, g1):
+        with self._lock:
+            r0, r1 = self.get(id0), self.get(id1)
+            expected = 1 / (1 + 10 ** ((r1 - r0) / 400))
+            delta = self.k * (_result(g0, g1) - expected)
+            self.ratings[id0] = r0 + delta
+            self.ratings[id1] = r1 - delta
+            self.games[id0] = self.games.get(id0, 0) + 1
+            self.games[id1] = self.games.get(id1, 0) + 1
+
+    def replay(self, matches):
+        """Recomputes all ratings from (id0, id1, g0, g1) tuples in the order they were played."""
+        with self._lock:
+            self.ratings = {}
+            self.games = {}
+        if np is None:
+            for match in matches:
+                self.update(*match)
+            return
+        if not matches:
+            return
+
+        history = np.array(matches, dtype=np.int64)
+        players, index = np.unique(history[:, :2], return_inverse=True)
+        index = index.reshape(-1, 2)
+        results = (np.sign(history[:, 2] - history[:, 3]) + 1) / 2
+
+        # A match goes into the batch right after the last batch of either player.
+        last_batch = [-1] * len(players)
+        batches = []
+        for a, b in index.tolist():
+            batch = last_batch[a] if last_batch[a] > last_batch[b] else last_batch[b]
+            batch += 1
+            last_batch[a] = last_batch[b] = batch
+            batches.append(batch)
+
+        batches = np.array(batches)
+        order = np.argsort(batches, kind='stable')
+        bounds = np.flatnonzero(np.diff(batches[order])) + 1
+        index0, index1 = index[order, 0], index[order, 1]
+        results = results[order]
+
+        ratings = np.full(len(players), self.base)
+        for batch in np.split(np.arange(len(order)), bounds):
+            a, b = index0[batch], index1[batch]
+            expected = 1 / (1 + 10 ** ((ratings[b] - ratings[a]) / 400))
+            delta = self.k * (results[batch] - expected)
+            ratings[a] += delta
+            ratings[b] -= delta
+
+        games = np.bincount(np.concatenate((index0, index1)), minlength=len(players))
+        players = players.tolist()
+        with self._lock:
+            self.ratings = dict(zip(players, ratings.tolist()))
+            self.games = dict(zip(players, games.tolist()))
+
+    def get_ranking(self, players=None):
+        """Returns (player, rating) sorted by rating, for the given players or everybody rated."""
+        if players is None:
+            players = self.ratings
+        return sorted(((player, self.get(player)) for player in players), key=lambda x: x[1], reverse=True)
+
+    def get_rating_table(self, db, players=None):
+        ranking = self.get_ranking(players)
+        usernames = db.get_usernames([player for player, _ in ranking])
+
+        respond = "Рейтинг Эло\n\n"
+        for i, ((player, rating), username) in enumerate(zip(ranking, usernames), start=1):
+            respond += f"{i}. {username} [{rating:.0f}, {self.games.get(player, 0)} игр]\n"
+        return respond
+
+
+def load_matches(path):
+    """Returns every played match stored in path as (id0, id1, g0, g1), season by season."""
+    matches = []
+    for tag, season in list_leagues(path):
+        data, _ = open_league_storage(path, tag, season).load()
+        for row in sorted(data, key=lambda row: row['ID']):
+            match = Match(row['id0'], row['id1'], row['score'])
+            if match.played:
+                matches.append((match.id0, match.id1, *match.score))
+    return matches
+
+
+_ratings = {}
+
+def get_ratings(path):
+    """Returns the ratings for path, replaying the stored history on first use."""
+    ratings = _ratings.get(path)
+    if ratings is None:
+        ratings = EloRatings()
+        ratings.replay(load_matches(path))
+        _ratings[path] = ratings
+    return ratings
+
+def record_result(path, id0, id1, score):
+    """Applies a new result to the ratings of path, if they have been built already."""
+    ratings = _ratings.get(path)
+    if ratings is not None:
+        ratings.update(id0, id1, *score)
@@ -0,0 +1,75 @@
+MATCH_FIELDS = ('ID', 'stage', 'tag', 'number', 'id0', 'id1', 'score')
+
+
+class MatchRow:
+    """One league match, stored in slots but read like the old row dicts."""
+
+    __slots__ = MATCH_FIELDS
+
+    def __init__(self, ID, stage, tag, number, id0='', id1='', score=''):
+        self.ID = ID
+        self.stage = stage
+        self.tag = tag
+        self.number = number
+        self.id0 = id0
+        self.id1 = id1
+        self.score = score
+
+    @classmethod
+    def decode(cls, row):
+        """Builds a row from CSV strings, converting ID, number and player ids to int."""
+        id0, id1 = row['id0'], row['id1']
+        try:
+            id0, id1 = int(id0), int(id1)
+        except (TypeError, ValueError):
+            pass
+        return cls(int(row['ID']), row['stage'], row['tag'], int(row['number']), id0, id1, row['score'])
+
+    @classmethod
+    def from_dict(cls, row):
+        return cls(*(row[field] for field in MATCH_FIELDS))
+
+    def encode(self):
+        """Returns the values in MATCH_FIELDS order, as csv.writer expects them."""
+        return [getattr(self, field) for field in MATCH_FIELDS]
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in MATCH_FIELDS}
+
+    def copy(self):
+        return MatchRow(*self.encode())
+
+    def update(self, row):
+        for field, value in row.items():
+            setattr(self, field, value)
+
+    def keys(self):
+        return MATCH_FIELDS
+
+    def items(self):
+        return self.to_dict().items()
+
+    def get(self, field, default=None):
+        return getattr(self, field, default) if field in MATCH_FIELDS else default
+
+    def __getitem__(self, field):
+        try:
+            return getattr(self, field)
+        except (AttributeError, TypeError):
+            raise KeyError(field)
+
+    def __setitem__(self, field, value):
+        try:
+            setattr(self, field, value)
+        except (AttributeError, TypeError):
+            raise KeyError(field)
+
+    def __eq__(self, other):
+        if isinstance(other, MatchRow):
+            return self.encode() == other.encode()
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"MatchRow({', '.join(f'{field}={getattr(self, field)!r}' for field in MATCH_FIELDS)})"
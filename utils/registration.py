@@ -0,0 +1,146 @@
+import json
+import random
+
+from utils.file_lock import FileLock
+from utils.storage import _file_stamp, _replace_file
+from utils.super_league_registrator import SuperLeagueRegistrator
+
+
+class RegistrationList:
+    """One registration message: its text lines and, for every team line, the registered username."""
+
+    __slots__ = ('message_id', 'thread_id', 'lines', 'slots', 'free')
+
+    def __init__(self, message_id, thread_id, lines, slots):
+        self.message_id = message_id
+        self.thread_id = thread_id
+        self.lines = lines
+        # [line index, username or None] per team line.
+        self.slots = slots
+        self.free = [index for index, (_, username) in enumerate(slots) if username is None]
+
+    def render(self):
+        lines = list(self.lines)
+        for line, username in self.slots:
+            if username is not None:
+                lines[line] += f' @{username}'
+        return '\n'.join(lines)
+
+    def to_dict(self):
+        return {'message_id': self.message_id, 'thread_id': self.thread_id,
+                'lines': self.lines, 'slots': self.slots}
+
+
+class RegistrationStore:
+    """Superleague registration lists, kept in {path}/superleague_registration.json."""
+
+    def __init__(self, path):
+        self.file_path = f'{path}/superleague_registration.json'
+        self.lock = FileLock(f'{self.file_path}.lock')
+        self.lists = {}
+        self._slot_of = {}
+        self._stamp = None
+        self.refresh()
+
+    def refresh(self):
+        """Reloads the lists if the file was changed outside this store."""
+        if _file_stamp(self.file_path) == self._stamp:
+            return
+        self._stamp = _file_stamp(self.file_path)
+        try:
+            with open(self.file_path, encoding='utf-8') as file:
+                entries = json.load(file)
+        except FileNotFoundError:
+            entries = []
+
+        self.lists = {}
+        self._slot_of = {}
+        for entry in entries:
+            self._add(RegistrationList(entry['message_id'], entry['thread_id'], entry['lines'], entry['slots']))
+
+    def _add(self, registration):
+        self.lists[registration.message_id] = registration
+        for index, (_, username) in enumerate(registration.slots):
+            if username is not None:
+                self._slot_of[username] = (registration.message_id, index)
+
+    def _remove(self, message_id):
+        registration = self.lists.pop(message_id)
+        for _, username in registration.slots:
+            if username is not None:
+                self._slot_of.pop(username, None)
+
+    def _save(self):
+        entries = [registration.to_dict() for registration in self.lists.values()]
+        _replace_file(self.file_path, lambda file: json.dump(entries, file, ensure_ascii=False))
+        self._stamp = _file_stamp(self.file_path)
+
+    def open_list(self, message_id, thread_id, text):
+        """Starts registration on a posted list, replacing the list of the same thread."""
+        registrator = SuperLeagueRegistrator()
+        lines = text.splitlines()
+        slots = []
+        for index, line in enumerate(lines):
+            if not registrator.is_team_line(line):
+                continue
+            username = registrator.extract_username(line)
+            if username is not None:
+                lines[index] = line[:line.rindex('@')].rstrip()
+            slots.append([index, username])
+
+        with self.lock:
+            self.refresh()
+            for other in [other for other in self.lists.values() if other.thread_id == thread_id]:
+                print(f"removed message with id {other.message_id}")
+                self._remove(other.message_id)
+            self._add(RegistrationList(message_id, thread_id, lines, slots))
+            self._save()
+        print(f"added message with id {message_id}")
+
+    def is_open(self):
+        return bool(self.lists)
+
+    def is_registered(self, username):
+        return username in self._slot_of
+
+    def register(self, username):
+        """Puts username on a random free slot; returns (message_id, slot line) or None."""
+        with self.lock:
+            self.refresh()
+            if username in self._slot_of:
+                return None
+            open_lists = [registration for registration in self.lists.values() if registration.free]
+            if not open_lists:
+                return None
+
+            registration = random.choice(open_lists)
+            free = registration.free
+            index = random.randrange(len(free))
+            free[index], free[-1] = free[-1], free[index]
+            slot = free.pop()
+            registration.slots[slot][1] = username
+            self._slot_of[username] = (registration.message_id, slot)
+            self._save()
+
+        line = registration.lines[registration.slots[slot][0]]
+        return registration.message_id, f'{line} @{username}'
+
+    def render(self, message_id):
+        return self.lists[message_id].render()
+
+    def get_groups(self):
+        """Registered usernames of every list, in the order the lists were opened."""
+        return [[username for _, username in registration.slots if username is not None]
+                for registration in self.lists.values()]
+
+
+_stores = {}
+
+def get_registration_store(path):
+    store = _stores.get(path)
+    if store is None:
+        store = RegistrationStore(path)
+        _stores[path] = store
+    else:
+        store.refresh()
+    return store
@@ -0,0 +1,135 @@
+import math
+import random
+
+from utils.config_utils import CONFIG
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DEFAULT_GOALS = 1.4
+
+
+class QualificationSimulator:
+    """Plays the remaining group matches many times over, ranking each season like make_playoff."""
+
+    def __init__(self, league, ratings=None):
+        groups = league.get_groups()
+        self.players = []
+        self.groups = []
+        index = {}
+        for group in groups.values():
+            first = len(self.players)
+            for player in group.standings:
+                index[player] = len(self.players)
+                self.players.append(player)
+            self.groups.append((first, len(self.players)))
+
+        standings = [item for group in groups.values() for item in group.standings.values()]
+        self.points = [item.points for item in standings]
+        self.scored = [item.scored for item in standings]
+        self.conceded = [item.conceded for item in standings]
+
+        games = sum(item.games for item in standings)
+        goals = sum(self.scored) / games if games else DEFAULT_GOALS
+
+        self.remaining = []
+        for group in groups.values():
+            for match in group.matches:
+                if match.played:
+                    continue
+                expected = 0.5
+                if ratings is not None:
+                    expected = 1 / (1 + 10 ** ((ratings.get(match.id1) - ratings.get(match.id0)) / 400))
+                self.remaining.append((index[match.id0], index[match.id1], 2 * goals * expected, 2 * goals * (1 - expected)))
+
+        if league.league_tag == 'SL':
+            self.promoted = len(self.players)
+        else:
+            self.promoted = league.get_promoted_count(len(self.players)) if self.players else 0
+
+    def run(self, simulations=None, seed=None):
+        """Returns {player: (first place probability, playoff probability)}."""
+        simulations = int(simulations or CONFIG.get('simulation_runs', 10000))
+        simulate = _simulate_numpy if np is not None else _simulate_python
+        first, promoted = simulate(self, simulations, seed)
+        return {player: (first[i] / simulations, promoted[i] / simulations)
+                for i, player in enumerate(self.players)}
+
+
+def _simulate_numpy(model, simulations, seed):
+    rng = np.random.default_rng(seed)
+    size = len(model.players)
+    points = np.tile(np.array(model.points, dtype=np.int64), (simulations, 1))
+    scored = np.tile(np.array(model.scored, dtype=np.int64), (simulations, 1))
+    conceded = np.tile(np.array(model.conceded, dtype=np.int64), (simulations, 1))
+
+    if model.remaining:
+        index0, index1, goals0, goals1 = (np.array(column) for column in zip(*model.remaining))
+        g0 = rng.poisson(goals0, size=(simulations, len(index0)))
+        g1 = rng.poisson(goals1, size=(simulations, len(index0)))
+        # One-hot match -> player matrices; float matmuls go through BLAS and are exact for these sizes.
+        home = np.zeros((len(index0), size))
+        away = np.zeros((len(index0), size))
+        home[np.arange(len(index0)), index0] = 1
+        away[np.arange(len(index0)), index1] = 1
+        g0, g1 = g0.astype(float), g1.astype(float)
+
+        draws = g0 == g1
+        won0, won1 = 3.0 * (g0 > g1) + draws, 3.0 * (g1 > g0) + draws
+        points += (won0 @ home + won1 @ away).astype(np.int64)
+        scored += (g0 @ home + g1 @ away).astype(np.int64)
+        conceded += (g1 @ home + g0 @ away).astype(np.int64)
+
+    # Same order as get_prioritized: points, goal difference, goals scored.
+    key = points * 10 ** 8 + (scored - conceded + 10 ** 4) * 10 ** 4 + np.minimum(scored, 10 ** 4 - 1)
+    place = np.empty_like(key)
+    ranks = np.arange(size)
+    for first, last in model.groups:
+        order = np.argsort(-key[:, first:last], axis=1, kind='stable')
+        np.put_along_axis(place[:, first:last], order, np.broadcast_to(ranks[:last - first], order.shape), axis=1)
+
+    # get_rated_list: all first places, then all second places and so on, each sorted like a group.
+    order = np.argsort(place * 10 ** 13 - key, axis=1, kind='stable')
+    promoted = np.bincount(order[:, :model.promoted].ravel(), minlength=size)
+    first = (place == 0).sum(axis=0)
+    return first.tolist(), promoted.tolist()
+
+
+def _poisson(rng, mean):
+    limit, k, p = math.exp(-mean), 0, rng.random()
+    while p > limit:
+        k += 1
+        p *= rng.random()
+    return k
+
+
+def _simulate_python(model, simulations, seed):
+    rng = random.Random(seed)
+    size = len(model.players)
+    first = [0] * size
+    promoted = [0] * size
+    for _ in range(simulations):
+        points, scored, conceded = list(model.points), list(model.scored), list(model.conceded)
+        for index0, index1, goals0, goals1 in model.remaining:
+            g0, g1 = _poisson(rng, goals0), _poisson(rng, goals1)
+            points[index0] += 3 if g0 > g1 else int(g0 == g1)
+            points[index1] += 3 if g1 > g0 else int(g0 == g1)
+            scored[index0] += g0
+            scored[index1] += g1
+            conceded[index0] += g1
+            conceded[index1] += g0
+
+        key = lambda i: (points[i], scored[i] - conceded[i], scored[i])
+        places = []
+        for group_first, group_last in model.groups:
+            table = sorted(range(group_first, group_last), key=key, reverse=True)
+            first[table[0]] += 1
+            places.append(table)
+        rated = []
+        for place in range(max(len(table) for table in places)):
+            rated.extend(sorted((table[place] for table in places if place < len(table)), key=key, reverse=True))
+        for i in rated[:model.promoted]:
+            promoted[i] += 1
+    return first, promoted
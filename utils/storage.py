@@ -0,0 +1,580 @@
+import copy
+import csv
+import datetime
+import glob
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+
+from utils.config_utils import CONFIG
+from utils.file_lock import FileLock
+from utils.records import MATCH_FIELDS, MatchRow
+
+USER_FIELDS = ['ID', 'username', 'nick', 'rate', 'active', 'league']
+
+
+def _file_stamp(file_path):
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _replace_file(file_path, write):
+    """Writes through a temporary file, so readers and crashes never see a half-written file."""
+    tmp_path = f'{file_path}.tmp'
+    with open(tmp_path, mode='w', newline='') as file:
+        write(file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, file_path)
+
+
+def _decode_user(row):
+    row['ID'] = int(row['ID'])
+    row['rate'] = int(row['rate'])
+    row['active'] = int(row['active'])
+    return row
+
+
+class UsersStorage:
+    """Where UsersDatabaseCSV keeps its users; stamp() changes on outside writes, lock guards writes."""
+
+    def stamp(self):
+        raise NotImplementedError
+
+    def load(self):
+        raise NotImplementedError
+
+    def save_all(self, users):
+        raise NotImplementedError
+
+    def save_user(self, user, users):
+        self.save_all(users)
+
+    def delete_user(self, user_id, users):
+        self.save_all(users)
+
+
+class LeagueStorage:
+    """Where TournamentUtils keeps one league season; same contract as UsersStorage."""
+
+    def stamp(self):
+        raise NotImplementedError
+
+    def load(self):
+        """Returns (rows, metainfo)."""
+        raise NotImplementedError
+
+    def save_all(self, data, metainfo):
+        raise NotImplementedError
+
+    def save_rows(self, rows, data, metainfo):
+        """Persists new or changed rows; data and metainfo are the full league state."""
+        self.save_all(data, metainfo)
+
+    def save_metainfo(self, key, value, data, metainfo):
+        self.save_all(data, metainfo)
+
+#---------------------------------------------------------------------------------#
+class CSVUsersStorage(UsersStorage):
+    def __init__(self, path):
+        self.file_path = f"{path}/users.csv"
+        self.lock = FileLock(f"{path}/users.lock")
+
+    def stamp(self):
+        return _file_stamp(self.file_path)
+
+    def load(self):
+        with open(self.file_path, mode='r', newline='') as file:
+            reader = csv.DictReader(file)
+            return [_decode_user(row) for row in reader]
+
+    def save_all(self, users):
+        """Writes the current data to the CSV file."""
+        def write(file):
+            if users:
+                fieldnames = users[0].keys()
+                writer = csv.DictWriter(file, fieldnames=fieldnames)
+                writer.writeheader()
+                writer.writerows(users)
+            else:
+                writer = csv.DictWriter(file, fieldnames=[])
+                writer.writeheader()
+        _replace_file(self.file_path, write)
+
+
+class CSVLeagueStorage(LeagueStorage):
+    def __init__(self, path, tag, season):
+        self.file_path = f'{path}/{tag}-{season}.csv'
+        self.lock = FileLock(f'{path}/{tag}-{season}.lock')
+
+    def stamp(self):
+        return _file_stamp(self.file_path)
+
+    def load(self):
+        data, metainfo = [], []
+        try:
+            with open(self.file_path, mode='r', newline='') as file:
+                reader = csv.DictReader(file)
+                for row in reader:
+                    if row['stage'] == 'metainfo':
+                        metainfo.append(row)
+                    else:
+                        data.append(MatchRow.decode(row))
+        except FileNotFoundError:
+            pass
+        return data, metainfo
+
+    def save_all(self, data, metainfo):
+        """Writes the current data to the CSV file."""
+        _replace_file(self.file_path, lambda file: self._write_rows(file, data, metainfo))
+
+    def _write_rows(self, file, data, metainfo):
+        if data:
+            writer = csv.writer(file)
+            writer.writerow(MATCH_FIELDS)
+            writer.writerows(row.encode() for row in data)
+            writer.writerows([meta.get(field, '') for field in MATCH_FIELDS] for meta in metainfo)
+
+
+class JournalLeagueStorage(CSVLeagueStorage):
+    """CSV snapshot plus an append-only journal of changes, compacted in the background; state_at() replays it."""
+
+    def __init__(self, path, tag, season, compact_every=None):
+        super().__init__(path, tag, season)
+        self.journal_path = f'{path}/{tag}-{season}.journal'
+        self.history_path = f'{path}/{tag}-{season}.history'
+        self.compact_every = int(compact_every or CONFIG.get('journal_compact_every', 100))
+        self._lock = threading.Lock()
+        self._compactor = None
+        self._entries = 0
+        self._known_ids = set()
+        self._revision = 0
+        self._disk = None
+
+    def _disk_stamp(self):
+        return (_file_stamp(self.file_path), _file_stamp(self.journal_path))
+
+    def stamp(self):
+        """Changes on our own appends and on outside edits, but not on our compactions."""
+        with self._lock:
+            disk = self._disk_stamp()
+            if disk != self._disk:
+                self._disk = disk
+                self._revision += 1
+            return self._revision
+
+    def _read_journal(self, file_path):
+        try:
+            with open(file_path, mode='r') as file:
+                return [json.loads(line) for line in file if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def load(self):
+        with self._lock:
+            data, metainfo = super().load()
+            entries = self._read_journal(self.journal_path)
+            self._entries = len(entries)
+        self._replay(entries, data, metainfo)
+        self._known_ids = {row['ID'] for row in data}
+        return data, metainfo
+
+    def _replay(self, entries, data, metainfo):
+        by_id = {row['ID']: row for row in data}
+        for entry in entries:
+            op = entry['op']
+            if op == 'reset':
+                data[:] = [MatchRow.from_dict(row) for row in entry['rows']]
+                metainfo[:] = copy.deepcopy(entry['metainfo'])
+                by_id = {row['ID']: row for row in data}
+            elif op == 'row':
+                row = entry['row']
+                if row['ID'] in by_id:
+                    by_id[row['ID']].update(row)
+                    continue
+                row = MatchRow.from_dict(row)
+                by_id[row['ID']] = row
+                after = by_id.get(entry.get('after'))
+                if after is None:
+                    data.append(row)
+                else:
+                    data.insert(data.index(after) + 1, row)
+            elif op == 'meta':
+                meta = next((row for row in metainfo if row['tag'] == entry['key']), None)
+                if meta is None:
+                    meta = {'ID': len(metainfo), 'stage': 'metainfo', 'tag': entry['key']}
+                    metainfo.append(meta)
+                meta['number'] = entry['value']
+
+    def _append(self, entries):
+        with self._lock:
+            with open(self.journal_path, mode='a') as file:
+                for entry in entries:
+                    entry['ts'] = time.time()
+                    file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                file.flush()
+                os.fsync(file.fileno())
+            self._entries += len(entries)
+            self._disk = self._disk_stamp()
+            self._revision += 1
+            compact = self._entries >= self.compact_every and self._compactor is None
+        if compact:
+            self._compactor = threading.Thread(target=self.compact, daemon=True)
+            self._compactor.start()
+
+    def save_all(self, data, metainfo):
+        self._append([{'op': 'reset', 'rows': [row.to_dict() for row in data], 'metainfo': copy.deepcopy(metainfo)}])
+        self._known_ids = {row['ID'] for row in data}
+
+    def save_rows(self, rows, data, metainfo):
+        entries = []
+        for row in rows:
+            entry = {'op': 'row', 'row': row.to_dict()}
+            if row['ID'] not in self._known_ids:
+                position = data.index(row)
+                entry['after'] = data[position - 1]['ID'] if position > 0 else None
+                self._known_ids.add(row['ID'])
+            entries.append(entry)
+        self._append(entries)
+
+    def save_metainfo(self, key, value, data, metainfo):
+        self._append([{'op': 'meta', 'key': key, 'value': str(value)}])
+
+    def compact(self):
+        """Folds the journal into a fresh CSV snapshot and moves its entries to the history."""
+        try:
+            with self.lock:
+                with self._lock:
+                    data, metainfo = CSVLeagueStorage.load(self)
+                    entries = self._read_journal(self.journal_path)
+                    folded = len(entries)
+                    history_missing = not os.path.exists(self.history_path)
+                if history_missing:
+                    entries = [{'op': 'reset', 'rows': [row.to_dict() for row in data],
+                                'metainfo': copy.deepcopy(metainfo), 'ts': 0}] + entries
+                self._replay(entries, data, metainfo)
+
+                snapshot_path = f'{self.file_path}.snapshot'
+                with open(snapshot_path, mode='w', newline='') as file:
+                    self._write_rows(file, data, metainfo)
+                    file.flush()
+                    os.fsync(file.fileno())
+
+                with self._lock:
+                    # Anything appended since the journal was read stays in it.
+                    tail = self._read_journal(self.journal_path)[folded:]
+                    with open(self.history_path, mode='a') as file:
+                        for entry in entries:
+                            file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                        file.flush()
+                        os.fsync(file.fileno())
+                    os.replace(snapshot_path, self.file_path)
+                    with open(f'{self.journal_path}.tmp', mode='w') as file:
+                        for entry in tail:
+                            file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                        file.flush()
+                        os.fsync(file.fileno())
+                    os.replace(f'{self.journal_path}.tmp', self.journal_path)
+                    self._entries = len(tail)
+                    self._disk = self._disk_stamp()
+                print(f"[compact] {self.file_path}: {folded} entries folded")
+        finally:
+            self._compactor = None
+
+    def history(self):
+        """Returns every recorded change of the season, oldest first."""
+        with self._lock:
+            entries = self._read_journal(self.history_path)
+            if not entries:
+                data, metainfo = CSVLeagueStorage.load(self)
+                entries = [{'op': 'reset', 'rows': [row.to_dict() for row in data], 'metainfo': metainfo, 'ts': 0}]
+            return entries + self._read_journal(self.journal_path)
+
+    def state_at(self, timestamp):
+        """Rebuilds (rows, metainfo) as they were at the given unix time."""
+        data, metainfo = [], []
+        self._replay([entry for entry in self.history() if entry['ts'] <= timestamp], data, metainfo)
+        return data, metainfo
+
+#---------------------------------------------------------------------------------#
+# ID is not the rowid alias, so rowid keeps the users in insertion order.
+USERS_SCHEMA = (
+    '''CREATE TABLE IF NOT EXISTS users (
+    ID INTEGER NOT NULL UNIQUE,
+    username TEXT,
+    nick TEXT,
+    rate INTEGER,
+    active INTEGER,
+    league TEXT
+)''',
+    'CREATE INDEX IF NOT EXISTS users_username ON users(username COLLATE NOCASE)',
+)
+
+SQLITE_SCHEMA = ';\n'.join(USERS_SCHEMA) + ''';
+
+CREATE TABLE IF NOT EXISTS matches (
+    league TEXT NOT NULL,
+    season INTEGER NOT NULL,
+    ID INTEGER NOT NULL,
+    stage TEXT,
+    tag TEXT,
+    number INTEGER,
+    id0 INTEGER,
+    id1 INTEGER,
+    score TEXT,
+    PRIMARY KEY (league, season, ID)
+);
+CREATE INDEX IF NOT EXISTS matches_slot ON matches(league, season, stage, tag, number);
+CREATE INDEX IF NOT EXISTS matches_players ON matches(league, season, id0, id1);
+
+CREATE TABLE IF NOT EXISTS metainfo (
+    league TEXT NOT NULL,
+    season INTEGER NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT,
+    PRIMARY KEY (league, season, key)
+);
+
+CREATE TABLE IF NOT EXISTS revisions (
+    name TEXT PRIMARY KEY,
+    revision INTEGER NOT NULL
+);
+'''
+
+
+def sqlite_connect(path):
+    connection = sqlite3.connect(f'{path}/bot.db', check_same_thread=False)
+    connection.row_factory = sqlite3.Row
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    connection.executescript(SQLITE_SCHEMA)
+    _upgrade_users_table(connection)
+    return connection
+
+
+def _upgrade_users_table(connection):
+    """Rebuilds a users table from before USERS_SCHEMA, where ID was the rowid and users loaded in ID order."""
+    if not any(row['name'] == 'ID' and row['pk'] for row in connection.execute('PRAGMA table_info(users)')):
+        return
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+        if any(row['name'] == 'ID' and row['pk'] for row in connection.execute('PRAGMA table_info(users)')):
+            connection.execute('ALTER TABLE users RENAME TO users_old')
+            connection.execute('DROP INDEX IF EXISTS users_username')
+            for statement in USERS_SCHEMA:
+                connection.execute(statement)
+            connection.execute(f"INSERT INTO users SELECT {', '.join(USER_FIELDS)} FROM users_old ORDER BY rowid")
+            connection.execute('DROP TABLE users_old')
+            print("[sqlite] users table rebuilt to keep insertion order")
+        connection.execute('COMMIT')
+    except Exception:
+        connection.execute('ROLLBACK')
+        raise
+
+
+class _SQLiteStorage:
+    """Shared bits of the SQLite storages: a connection and a revision counter per table set."""
+
+    def __init__(self, path, name):
+        self.file_path = f'{path}/bot.db'
+        self.name = name
+        self.lock = FileLock(f'{path}/{name}.lock')
+        self.connection = sqlite_connect(path)
+
+    def stamp(self):
+        row = self.connection.execute(
+            'SELECT revision FROM revisions WHERE name = ?', (self.name,)).fetchone()
+        return row['revision'] if row else 0
+
+    def _bump_revision(self):
+        self.connection.execute(
+            'INSERT INTO revisions (name, revision) VALUES (?, 1) '
+            'ON CONFLICT(name) DO UPDATE SET revision = revision + 1', (self.name,))
+
+
+class SQLiteUsersStorage(_SQLiteStorage, UsersStorage):
+    def __init__(self, path):
+        super().__init__(path, 'users')
+
+    def load(self):
+        rows = self.connection.execute(f"SELECT {', '.join(USER_FIELDS)} FROM users ORDER BY rowid")
+        return [dict(row) for row in rows]
+
+    def _values(self, user):
+        return tuple(user[field] for field in USER_FIELDS)
+
+    def save_all(self, users):
+        with self.connection:
+            self.connection.execute('DELETE FROM users')
+            self.connection.executemany(
+                'INSERT INTO users VALUES (?, ?, ?, ?, ?, ?)', [self._values(user) for user in users])
+            self._bump_revision()
+
+    def save_user(self, user, users):
+        with self.connection:
+            self.connection.execute(
+                'INSERT INTO users VALUES (?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT(ID) DO UPDATE SET username = excluded.username, nick = excluded.nick, '
+                'rate = excluded.rate, active = excluded.active, league = excluded.league',
+                self._values(user))
+            self._bump_revision()
+
+    def delete_user(self, user_id, users):
+        with self.connection:
+            self.connection.execute('DELETE FROM users WHERE ID = ?', (user_id,))
+            self._bump_revision()
+
+
+class SQLiteLeagueStorage(_SQLiteStorage, LeagueStorage):
+    def __init__(self, path, tag, season):
+        super().__init__(path, f'{tag}-{season}')
+        self.tag = tag
+        self.season = season
+        self._row_count = 0
+
+    def load(self):
+        rows = self.connection.execute(
+            'SELECT ID, stage, tag, number, id0, id1, score FROM matches '
+            'WHERE league = ? AND season = ? ORDER BY rowid',
+            (self.tag, self.season))
+        data = []
+        for ID, stage, tag, number, id0, id1, score in rows:
+            data.append(MatchRow(ID, stage, tag, number,
+                                 '' if id0 is None else id0, '' if id1 is None else id1, score))
+        self._row_count = len(data)
+
+        rows = self.connection.execute(
+            'SELECT key, value FROM metainfo WHERE league = ? AND season = ? ORDER BY rowid',
+            (self.tag, self.season))
+        metainfo = [
+            {'ID': index, 'stage': 'metainfo', 'tag': row['key'], 'number': row['value']}
+            for index, row in enumerate(rows)
+        ]
+        return data, metainfo
+
+    def _values(self, row):
+        id0 = None if row['id0'] == '' else row['id0']
+        id1 = None if row['id1'] == '' else row['id1']
+        return (self.tag, self.season, row['ID'], row['stage'], row['tag'], row['number'], id0, id1, row['score'])
+
+    def _upsert_rows(self, rows):
+        self.connection.executemany(
+            'INSERT INTO matches VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT(league, season, ID) DO UPDATE SET stage = excluded.stage, tag = excluded.tag, '
+            'number = excluded.number, id0 = excluded.id0, id1 = excluded.id1, score = excluded.score',
+            [self._values(row) for row in rows])
+
+    def _upsert_metainfo(self, key, value):
+        self.connection.execute(
+            'INSERT INTO metainfo VALUES (?, ?, ?, ?) '
+            'ON CONFLICT(league, season, key) DO UPDATE SET value = excluded.value',
+            (self.tag, self.season, key, str(value)))
+
+    def save_all(self, data, metainfo):
+        with self.connection:
+            self.connection.execute(
+                'DELETE FROM matches WHERE league = ? AND season = ?', (self.tag, self.season))
+            self.connection.execute(
+                'DELETE FROM metainfo WHERE league = ? AND season = ?', (self.tag, self.season))
+            self._upsert_rows(data)
+            for row in metainfo:
+                self._upsert_metainfo(row['tag'], row['number'])
+            self._bump_revision()
+        self._row_count = len(data)
+
+    def save_rows(self, rows, data, metainfo):
+        # Rows load in rowid order, so a row inserted mid-league (a tie replay) needs a full rewrite.
+        new_rows = [row for row in rows if row['ID'] >= self._row_count]
+        tail = data[self._row_count:]
+        if len(tail) != len(new_rows) or any(row is not new for row, new in zip(tail, new_rows)):
+            self.save_all(data, metainfo)
+            return
+        with self.connection:
+            self._upsert_rows(rows)
+            self._bump_revision()
+        self._row_count = len(data)
+
+    def save_metainfo(self, key, value, data, metainfo):
+        with self.connection:
+            self._upsert_metainfo(key, value)
+            self._bump_revision()
+
+#---------------------------------------------------------------------------------#
+def _backend(backend):
+    backend = backend or CONFIG.get('storage', 'csv')
+    if backend not in ('csv', 'journal', 'sqlite'):
+        raise ValueError(f"Unknown storage backend '{backend}'")
+    return backend
+
+
+def open_users_storage(path, backend=None):
+    if _backend(backend) == 'sqlite':
+        return SQLiteUsersStorage(path)
+    return CSVUsersStorage(path)
+
+
+def open_league_storage(path, tag, season, backend=None):
+    if _backend(backend) == 'sqlite':
+        return SQLiteLeagueStorage(path, tag, season)
+    if _backend(backend) == 'journal':
+        return JournalLeagueStorage(path, tag, season)
+    return CSVLeagueStorage(path, tag, season)
+
+
+def list_leagues(path, backend=None):
+    """Returns (tag, season) of every league stored in path, oldest season first."""
+    if _backend(backend) == 'sqlite':
+        rows = sqlite_connect(path).execute('SELECT DISTINCT league, season FROM matches')
+        leagues = {(row['league'], row['season']) for row in rows}
+    else:
+        leagues = set()
+        for file_path in glob.glob(f'{path}/*-*.*'):
+            match = re.fullmatch(r'([A-Z]+)-(\d+)\.(csv|journal)', os.path.basename(file_path))
+            if match:
+                leagues.add((match.group(1), int(match.group(2))))
+    return sorted(leagues, key=lambda league: (league[1], league[0]))
+
+
+def migrate_csv_to_sqlite(path):
+    """Copies users.csv and every {tag}-{season}.csv in path into path/bot.db."""
+    users = CSVUsersStorage(path).load()
+    SQLiteUsersStorage(path).save_all(users)
+    print(f"[migrate] users: {len(users)}")
+
+    for file_path in sorted(glob.glob(f'{path}/*-*.csv')):
+        match = re.fullmatch(r'([A-Z]+)-(\d+)\.csv', os.path.basename(file_path))
+        if not match:
+            continue
+        tag, season = match.group(1), int(match.group(2))
+        data, metainfo = CSVLeagueStorage(path, tag, season).load()
+        SQLiteLeagueStorage(path, tag, season).save_all(data, metainfo)
+        print(f"[migrate] {tag}-{season}: {len(data)} matches, {len(metainfo)} metainfo")
+
+
+def print_state_at(path, tag, season, timestamp):
+    """Prints a journal-backed league as it was at timestamp (unix time or ISO date), as CSV."""
+    try:
+        timestamp = float(timestamp)
+    except ValueError:
+        timestamp = datetime.datetime.fromisoformat(timestamp).timestamp()
+    storage = JournalLeagueStorage(path, tag, int(season))
+    data, metainfo = storage.state_at(timestamp)
+    storage._write_rows(sys.stdout, data, metainfo)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 3 and sys.argv[1] == 'migrate':
+        migrate_csv_to_sqlite(sys.argv[2])
+    elif len(sys.argv) == 6 and sys.argv[1] == 'state-at':
+        print_state_at(*sys.argv[2:])
+    else:
+        print("usage: python -m utils.storage migrate <database_path>\n"
+              "       python -m utils.storage state-at <database_path> <tag> <season> <unix time or ISO date>")
+        sys.exit(1)
@@ -1,21 +1,19 @@
 import random
 import re
 
+# ^ indicates start of the line, \d+ matches one or more digits, \. matches the dot
+TEAM_LINE = re.compile(r'^\d+\.')
+USERNAME = re.compile(r'.*@(.*)')
+
 class SuperLeagueRegistrator:
     def __init__(self):
         pass
 
-    def _starts_with_number_and_dot(self, line):
-        # ^ indicates start of the line, \d+ matches one or more digits, \. matches the dot
-        pattern = r'^\d+\.'
-        if re.match(pattern, line):
-            return True
-        else:
-            return False
+    def is_team_line(self, line):
+        return TEAM_LINE.match(line) is not None
 
     def extract_username(self, line):
-        pattern = r'.*@(.*)'
-        obj = re.match(pattern, line)
+        obj = USERNAME.match(line)
         if obj:
             return obj.groups()[0]
         return None
@@ -29,7 +27,7 @@ class SuperLeagueRegistrator:
 
     def extract_lines_with_teams(self, text):
         split = text.splitlines()
-        lines = [line for line in split if self._starts_with_number_and_dot(line)]
+        lines = [line for line in split if self.is_team_line(line)]
         return lines
 
     def assign_user_to_random_line(self, lines, username):
@@ -48,11 +46,10 @@ class SuperLeagueRegistrator:
     def get_all_users(self, text):
         lines = self.extract_lines_with_teams(text)
         users = []
-        pattern = r'.*@(.*)'
         for line in lines:
-            obj = re.match(pattern, line)
-            if obj:
-                users.append(obj.groups()[0]) 
+            username = self.extract_username(line)
+            if username is not None:
+                users.append(username)
         return users
 
 
@@ -1,17 +1,44 @@
 import random
-import csv
-import copy
+import functools
 import math
 
 from utils.group_handler import *
-from utils.drawer import Drawer
+from utils.drawer import Drawer, separate
+from utils.bracket import Bracket, bracket_size, round_matches
+from utils.storage import open_league_storage
+from utils.records import MatchRow
+from utils.file_lock import locked
+from utils.archive import get_archive
+from utils.ratings import get_ratings, record_result
+from utils.simulator import QualificationSimulator
+from utils.config_utils import CONFIG
+from utils.metrics import count_cache, count_parse, timed
+
+
+def cached_render(method):
+    """Caches rendered output until the league rows or the users change."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        versions = (self.version, self.db.version)
+        if self._render_versions != versions:
+            self._render_cache.clear()
+            self._render_versions = versions
+
+        key = (method.__name__, args, tuple(sorted(kwargs.items())))
+        count_cache('render', key in self._render_cache)
+        if key not in self._render_cache:
+            self._render_cache[key] = method(self, *args, **kwargs)
+        return self._render_cache[key]
+    return wrapper
 
 class TournamentUtils:
-    def __init__(self, db, path, tag, id):
+    def __init__(self, db, path, tag, id, storage=None):
         self.db = db 
+        self.path = path
         self.league_tag = tag 
         self.id = id      
-        self.file_path = f'{path}/{tag}-{id}.csv'
+        self.storage = storage or open_league_storage(path, tag, id)
+        self.file_path = self.storage.file_path
         print(self.file_path)
         if 'CL' in tag:
             self.name = 'Лига Чемпионов'
@@ -21,55 +48,91 @@ class TournamentUtils:
             self.name = 'Суперлига'
         self.data = []
         self.metainfo = []
+        self._stamp = None
+        self.version = 0
+        self._groups = None
+        self._group_matches = {}
+        self._pair_rows = {}
+        self._bracket = Bracket()
+        self._stage_counts = {}
+        self._stage = None
+        self._transitions = []
+        self._archived_version = None
+        self._render_cache = {}
+        self._render_versions = None
         self._read_data()
 
+    def refresh(self):
+        """Reloads the league if its storage was changed outside the bot."""
+        if self.storage.stamp() != self._stamp:
+            print(f"[refresh] {self.file_path} changed on disk, reloading")
+            self._read_data()
+
+    @timed('read_data')
     def _read_data(self):
-        try:
-            with open(self.file_path, mode='r', newline='') as file:
-                reader = csv.DictReader(file)
-                self.data.clear()
-                self.metainfo.clear()               
-                for row in reader:
-                    if row['stage'] == 'metainfo':
-                        self.metainfo.append(row)
-                    else:
-                        row['number'] = int(row['number'])
-                        try:
-                            row['id0'] = int(row['id0'])
-                            row['id1'] = int(row['id1'])
-                        except:
-                            pass
-                        self.data.append(row)
-        except:
+        count_parse('league')
+        self._stamp = self.storage.stamp()
+        data, metainfo = self.storage.load()
+        self.data[:] = data
+        self.metainfo[:] = metainfo
+        self._groups = None
+        self._reindex()
+        self._stage = self._derive_stage()
+        self.version += 1
+
+    def _reindex(self):
+        self._pair_rows = {}
+        self._bracket = Bracket()
+        self._stage_counts = {}
+        for row in self.data:
+            self._index_row(row)
+
+    def _index_row(self, row, after=None):
+        """Adds row to the pair index and the playoff bracket, right behind `after` if given."""
+        counts = self._stage_counts.setdefault(row['stage'], [0, 0])
+        counts[0] += 1
+        if row['score'] != '':
+            counts[1] += 1
+
+        if row['stage'] == 'playoff':
+            self._bracket.add_row(row, after)
+
+        key = self._pair_key(row)
+        if key is None:
             return
+        rows = self._pair_rows.setdefault(key, [])
+        if after is not None and after in rows:
+            rows.insert(rows.index(after) + 1, row)
+        else:
+            rows.append(row)
 
-    def _save_data(self):
-        """Writes the current data to the CSV file."""
-        with open(self.file_path, mode='w', newline='') as file:
-            if self.data:
-                fieldnames = self.data[0].keys()
-                writer = csv.DictWriter(file, fieldnames=fieldnames)
-                writer.writeheader()
-                writer.writerows(self.data)
-                writer.writerows(self.metainfo)
+    def _pair_key(self, row):
+        if row['id0'] == '' or row['id1'] == '':
+            return None
+        return frozenset((row['id0'], row['id1']))
+
+    @timed('save_data')
+    def _save_data(self, rows=None):
+        """Writes the changed rows, or the whole league, to the storage."""
+        if rows is None:
+            self._groups = None
+            self.storage.save_all(self.data, self.metainfo)
+        else:
+            self.storage.save_rows(rows, self.data, self.metainfo)
+        self._stamp = self.storage.stamp()
+        self.version += 1
 
     def _add_record(self, stage, tag, number, id0, id1, index=None):
-            new_record = {
-                "ID": len(self.data),
-                "stage" : stage,
-                "tag": tag,
-                "number": number,
-                "id0": id0,
-                "id1": id1,
-                "score": ''
-            }
+            new_record = MatchRow(len(self.data), stage, tag, number, id0, id1)
             self.data.append(new_record)
+            self._index_row(new_record)
 
+    @locked
     def set_metainfo(self, key, value):
         for row in self.metainfo:
             if row['tag'] == key:
                 row['number'] = value
-                self._save_data()
+                self._save_metainfo(key, value)
                 print(f"updated {key} = {value}")
                 return
 
@@ -81,10 +144,13 @@ class TournamentUtils:
         }
         self.metainfo.append(new_record)
         print(f"added {key} = {value}")
-        self._save_data()
+        self._save_metainfo(key, value)
+
+    def _save_metainfo(self, key, value):
+        self.storage.save_metainfo(key, value, self.data, self.metainfo)
+        self._stamp = self.storage.stamp()
 
     def get_metainfo(self, key):
-        self._read_data()
         for row in self.metainfo:
             if row['tag'] == key:
                 return row['number']
@@ -96,19 +162,34 @@ class TournamentUtils:
         return self.name
 
     def get_stage(self):
-        self._read_data()
+        return self._derive_stage()
 
+    def _derive_stage(self):
+        """Derives the stage from the (total, played) match counters kept per stage."""
         if not self.data:
             return 'NOT-STARTED'
 
-        stage = 'PLAYOFF' if any('playoff' in row['stage'] for row in self.data) else 'GROUP'
+        stage = 'PLAYOFF' if 'playoff' in self._stage_counts else 'GROUP'
  
-        if all(row['score'] != '' for row in self.data):
+        if all(total == played for total, played in self._stage_counts.values()):
             stage += '-COMPLETE'
         
-        print(f"[get_stage], {stage}")
         return stage
+
+    def pop_transitions(self):
+        """Returns the stages entered since the previous call, oldest first."""
+        transitions, self._transitions = self._transitions, []
+        return transitions
+
+    def _check_stage(self):
+        stage = self._derive_stage()
+        if stage == self._stage:
+            return
+        print(f"[_check_stage] {self._stage} -> {stage}")
+        self._stage = stage
+        self._transitions.append(stage)
 #---------------------------------------------------------------------------------#
+    @cached_render
     def get_status(self, full=False):
         stage = self.get_stage()
         
@@ -140,25 +221,39 @@ class TournamentUtils:
         result += '#results'
         return result
 #---------------------------------------------------------------------------------#
-    def make_groups(self, groups_num):
+    @locked
+    def make_groups(self, groups_num, seeding=None, rules=()):
+        """Draws the groups, seeding pots by 'rate' or, with seeding='elo', by Elo; rules keep players apart."""
         if self.get_stage() != 'NOT-STARTED':
             return 'Турнир уже стартовал'
                 
         users = self.db.get_all_users()
         filtered_users = [user for user in users if user['league'] == self.league_tag]        
-        sorted_users = sorted(filtered_users, key=lambda x: x['rate'], reverse=True)
+        if (seeding or CONFIG.get('group_seeding', 'rate')) == 'elo':
+            ratings = get_ratings(self.path)
+            sorted_users = sorted(filtered_users, key=lambda x: ratings.get(x['ID']), reverse=True)
+        else:
+            sorted_users = sorted(filtered_users, key=lambda x: x['rate'], reverse=True)
         ids = [user['ID'] for user in sorted_users]
         print(ids)
         
-        drawer = Drawer()
-        groups = drawer.make_group_draw(ids, groups_num)
+        drawer = Drawer(random.randrange(2 ** 32), rules)
+        try:
+            groups = drawer.make_group_draw(ids, groups_num)
+        except ValueError:
+            print("[make_groups] no draw satisfies the rules, drawing freely")
+            drawer = Drawer(drawer.seed)
+            groups = drawer.make_group_draw(ids, groups_num)
         self.write_group_schedule(groups)
+        self.set_metainfo('group_draw_seed', drawer.seed)
         return self.make_draw_respond(groups)
 
+    @locked
     def write_group_schedule(self, groups, matches = 2):
         if self.get_stage() != 'NOT-STARTED':
             return
         self.data.clear()
+        self._reindex()
         for index, group in enumerate(groups):
             letter = chr(ord('A') + index)
             for i in range(len(group)):
@@ -166,6 +261,7 @@ class TournamentUtils:
                     for m in range(matches):
                         self._add_record('group', letter, 0, group[i], group[j])
         self._save_data()
+        self._check_stage()
 
     def make_draw_respond(self, groups):
         respond = f'{self.name}\n'
@@ -184,34 +280,87 @@ class TournamentUtils:
         return sorted_items
 
     def get_groups(self):
+        """Returns the groups with their standings, built once and then updated by write_score."""
+        if self._groups is not None:
+            return self._groups
+
         groups = {}
+        self._group_matches = {}
         for row in self.data:
             if 'group' == row['stage']:
                 tag = row['tag']
                 if groups.get(tag) == None:
                     groups[tag] = Group(tag)  
-                groups[tag].append_match(row['id0'], row['id1'], row['score'])
+                match = groups[tag].append_match(row['id0'], row['id1'], row['score'])
+                self._group_matches[row['ID']] = (groups[tag], match)
+        self._groups = groups
         return groups
     
+    @cached_render
     def show_all_tables(self, full = False):
         groups = self.get_groups()
-        messages = [group.compute_table(self.db, full) for group in groups.values()]
+        places = self.get_qualification_places()
+        messages = [group.compute_table(self.db, full, places) for group in groups.values()]
         
         if self.league_tag == 'CL':
             placed3rd = [group.items[2] for group in groups.values()]
             messages.append('Рейтинг третьих мест')
             messages.append(print_group(self.db, self.get_prioritized(placed3rd), '', 2))
+        if places and any(status in (CLINCHED, ELIMINATED)
+                          for group in groups.values() for status in group.get_qualification(*places).values()):
+            messages.append('✓ - в плей-офф, ✗ - без шансов')
         return messages 
+
+    def get_promoted_count(self, teams):
+        # Find the smallest power of 2 greater than half_teams
+        half_teams = teams / 2
+        return 2 ** math.ceil(math.log2(half_teams))
+
+    def get_qualification_places(self):
+        """Returns (clinch_places, alive_places) of the group stage, None when everybody goes through."""
+        groups = self.get_groups()
+        if self.league_tag == 'SL' or not groups:
+            return None
+        sizes = [len(group.standings) for group in groups.values()]
+        promoted = self.get_promoted_count(sum(sizes))
+        if promoted >= sum(sizes):
+            return None
+
+        clinch_places = 0
+        while sum(min(clinch_places + 1, size) for size in sizes) <= promoted:
+            clinch_places += 1
+        alive_places = clinch_places
+        if sum(min(clinch_places, size) for size in sizes) < promoted:
+            alive_places += 1
+        return clinch_places, alive_places
     
+    @cached_render
+    def get_qualification_odds(self, simulations=None):
+        if self.get_stage() != 'GROUP':
+            return 'Шансы считаются только во время группового этапа'
+
+        odds = QualificationSimulator(self, get_ratings(self.path)).run(simulations)
+        result = f"{self.name}\nШансы [1 место, плей-офф]\n"
+        for group in self.get_groups().values():
+            items = group.get_table()
+            result += f"\n● Group {group.name}\n"
+            usernames = self.db.get_usernames([item.id for item in items])
+            for item, username in zip(items, usernames):
+                first, promoted = odds[item.id]
+                result += f"{username[:14]:14} {first:4.0%} {promoted:5.0%}\n"
+        return f'<pre>{result}</pre>'
+
     def show_user_table(self, user_id):
         groups = self.get_groups()
         for group in groups.values():
             print(group.get_users())
             if user_id in group.get_users():
-                return f"{self.name}\n\n" + group.compute_table(self.db, False) 
+                return f"{self.name}\n\n" + group.compute_table(self.db, False, self.get_qualification_places()) 
         return 'Группа не найдена'  
 
-    def make_playoff(self):
+    @locked
+    def make_playoff(self, teams=None):
+        """Draws the playoff of the best `teams` players; the best ranked get the byes."""
         if 'PLAYOFF' in self.get_stage():
             return 'Плей-офф уже идет'
 
@@ -221,66 +370,45 @@ class TournamentUtils:
             return "Жеребьевка успешно проведена!"
     
         rated_teams = self.get_rated_list()
-        # Find the smallest power of 2 greater than half_teams
-        half_teams = len(rated_teams) / 2
-        promoted_count = 2 ** math.ceil(math.log2(half_teams))
+        promoted_count = teams or self.get_promoted_count(len(rated_teams))
         promoted_users = rated_teams[:promoted_count]
 
         ids = [user.id for user in promoted_users]
         print(ids)
+        byes = bracket_size(len(ids)) - len(ids)
+        bye_ids, ids = ids[:byes], ids[byes:]
         random.shuffle(ids)
 
         mid = len(ids) // 2
         seed = ids[:mid]
         non_seed = ids[mid:]
 
-        drawer = Drawer()
-        pairs = drawer.make_playoff_draw(seed, non_seed)
-        self.write_playoff_schedule(pairs)
+        # Group-mates do not meet again in the first playoff round.
+        group_of = {player: group.name for group in self.get_groups().values() for player in group.standings}
+        drawer = Drawer(random.randrange(2 ** 32), [separate(group_of)])
+        try:
+            pairs = drawer.make_playoff_draw(seed, non_seed)
+        except ValueError:
+            print("[make_playoff] no draw without group-mates, drawing freely")
+            drawer = Drawer(drawer.seed)
+            pairs = drawer.make_playoff_draw(seed, non_seed)
+
+        # Each bye takes the slot next to a tie, so it meets that tie's winner.
+        slots = []
+        for player in bye_ids:
+            slots.append([player, ''])
+            if pairs:
+                slots.append(pairs.pop())
+        self.write_playoff_schedule(slots + pairs)
+        self.set_metainfo('playoff_draw_seed', drawer.seed)
         return "Жеребьевка успешно проведена!"
 
-    def _get_stage_name(self, N):
-        if N >= 8:
-            return f"last{N*2}"
-        
-        stage_name = {
-            1: "final",
-            2: "semifinal",
-            4: "quarter",
-        }
-        return stage_name[N]
-
-    def _get_next_stage(self, stage):
-        print(f'[_get_next_stage] {stage}')
-        if stage.startswith('last'):
-            number_part = int(stage[4:])
-            new_number = number_part // 2
-            if new_number == 8:
-                return 'quarter'
-            return f'last{new_number}'
-            
-        if stage == 'quarter':
-            return 'semifinal'
-        if stage == 'semifinal':
-            return 'final'
-        return None
-
     def write_playoff_schedule(self, pairs):
-        N_pairs = len(pairs)
-        for i in range(N_pairs):
-            pair = pairs[i]
-            self._add_record('playoff', self._get_stage_name(N_pairs), i, pair[0], pair[1])
-            self._add_record('playoff', self._get_stage_name(N_pairs), i, pair[0], pair[1])
-
-        while N_pairs >= 2:
-            N_pairs = N_pairs//2
-            for i in range(N_pairs):
-                self._add_record('playoff', self._get_stage_name(N_pairs), i, "", "")
-                self._add_record('playoff', self._get_stage_name(N_pairs), i, "", "")
-
-        self._add_record('playoff','third', 0, "", "")
-        self._add_record('playoff','third', 0, "", "")
-        self._save_data()
+        first_new = len(self.data)
+        for tag, number, id0, id1 in self._bracket.layout(pairs):
+            self._add_record('playoff', tag, number, id0, id1)
+        self._save_data(self.data[first_new:])
+        self._check_stage()
 
     def parse_score(self, score):
         try:
@@ -290,63 +418,70 @@ class TournamentUtils:
             return None
 
     def parse_row(self, row):
-        player1 = self.db.get_username_by_id(row['id0']) 
-        player2 = self.db.get_username_by_id(row['id1'])
+        player1, player2 = self.db.get_usernames((row['id0'], row['id1']))
         score = self.parse_score(row['score'])
         if score:
             return f"{player1} {score[0]}:{score[1]} {player2}"
         return f"{player1} - {player2}"
 
+    @cached_render
     def get_playoff_schedule(self):
         stage_names = {
-            'last64': "1/32 финала",
-            'last32': "1/16 финала",
-            'last16': "1/8 финала",
             'quarter': "1/4 финала",
             'semifinal': "Полуфиналы",
             'final': "Финал",
             'third': "Матч за третье место"
         }
         
-        rounds = {stage: [] for stage in stage_names}
+        rounds = {}
         for row in self.data:
-            if row['stage'] == 'playoff' and row['tag'] in rounds:
-                rounds[row['tag']].append(self.parse_row(row))
-        
+            if row['stage'] == 'playoff':
+                rounds.setdefault(row['tag'], []).append(self.parse_row(row))
+
+        # Earliest round first, the third-place match last.
+        order = sorted(rounds, key=lambda tag: -(round_matches(tag) or 0))
         result = [
-            f"● {stage_names[stage]}\n" + '\n'.join(rounds[stage]) + '\n\n'
-            for stage in stage_names if rounds[stage]
+            f"● {stage_names.get(tag) or f'1/{round_matches(tag)} финала'}\n" + '\n'.join(rounds[tag]) + '\n\n'
+            for tag in order
         ]
         
         return ''.join(result)
 
+    @locked
     def write_score(self, id0, id1, score):
         print('[write_score]', id0, id1, score)
-        self._read_data()
 
-        for row in self.data:
+        for row in self._pair_rows.get(frozenset((id0, id1)), []):
             if row['score']:
                 continue
 
             if (row['id0'] == id0 and row['id1'] == id1):
-                row['score'] = f"{score[0]}:{score[1]}"
+                row_score = (score[0], score[1])
                 break
             
             if (row['id0'] == id1 and row['id1'] == id0):
-                row['score'] = f"{score[1]}:{score[0]}"
+                row_score = (score[1], score[0])
                 break        
         else:
             return "Матч для записи не найден"
 
-        self._save_data()
+        row['score'] = f"{row_score[0]}:{row_score[1]}"
+        self._stage_counts[row['stage']][1] += 1
+        if row['stage'] == 'group' and self._groups is not None:
+            group, match = self._group_matches[row['ID']]
+            group.record_score(match, row_score)
+        self._save_data([row])
+        record_result(self.path, row['id0'], row['id1'], row_score)
 
-        if self.get_stage() == 'PLAYOFF':
+        # Also for the last tie to finish: a drawn final or third-place match still needs its replay.
+        if row['stage'] == 'playoff':
             self.update_playoff_path(id0, id1)
 
+        # Checked only now, so a tie replay added by update_playoff_path is not reported as complete.
+        self._check_stage()
         return "Результат зафиксирован!"
 
     def update_playoff_path(self, id0, id1):
-        self._read_data()
         matches_played, winner, loser, last_row = self._analyze_matches(id0, id1)
         print(f"[update_playoff_path] w:{winner}, l:{loser}")
 
@@ -354,29 +489,27 @@ class TournamentUtils:
             return
         
         if winner is None:
-            self._handle_tie(last_row)
+            changed_rows = [self._handle_tie(last_row)]
         else:
-            next_tag = self._get_next_stage(last_row['tag'])
-            if next_tag is None:
+            changed_rows = self._handle_winner(self._bracket.node_of(last_row), winner, loser)
+            if not changed_rows:
                 return
-            self._handle_winner(next_tag, last_row, winner, loser)
 
-        self._save_data()
+        self._save_data(changed_rows)
 
     def _analyze_matches(self, id0, id1):
         g0, g1, matches_played = 0, 0, 0
         last_row = None
 
-        for row in self.data:
+        for row in self._pair_rows.get(frozenset((id0, id1)), []):
             if row['stage'] == 'playoff':
-                if {row['id0'], row['id1']} == {id0, id1}:
-                    match = Match(row['id0'], row['id1'], row['score'])
+                match = Match(row['id0'], row['id1'], row['score'])
 
-                    if match.played:
-                        matches_played += 1
-                        g0 += match.score[0]
-                        g1 += match.score[1]
-                        last_row = row
+                if match.played:
+                    matches_played += 1
+                    g0 += match.score[0]
+                    g1 += match.score[1]
+                    last_row = row
 
         winner, loser = None, None
         if g0 != g1:
@@ -387,37 +520,37 @@ class TournamentUtils:
 
     def _handle_tie(self, last_row):
         index = self.data.index(last_row)
-        new_row = copy.deepcopy(last_row)
+        new_row = last_row.copy()
         new_row['ID'] = len(self.data)
         new_row['score'] = ''
         self.data.insert(index + 1, new_row)
-
-    def _handle_winner(self, next_tag, last_row, winner, loser):
-        next_num = last_row['number'] // 2
-
-        for row in self.data:
-            if row['tag'] == next_tag and row['number'] == next_num:
-                id_key = 'id0' if row['id0'] == '' else 'id1'
-                row[id_key] = winner
-
-        if next_tag == 'final':
-            self._assign_loser_to_third_place(loser)
-
-    def _next_stage_tag(self, stage_id, match_id):
-        stage_id = int(stage_id)
-        match_id = int(match_id)
-        return f"last-{stage_id // 2}-{match_id // 2}"
-
-    def _assign_loser_to_third_place(self, loser):
-        for row in self.data:
-            if row['tag'] == 'third':
-                id_key = 'id0' if row['id0'] == '' else 'id1'
-                row[id_key] = loser
+        self._index_row(new_row, after=last_row)
+        return new_row
+
+    def _handle_winner(self, node, winner, loser):
+        """Moves the winner up to the parent tie and a semifinal loser to the third-place tie."""
+        changed_rows = []
+        for target, player in ((node.parent, winner), (node.loser_to, loser)):
+            if target is None:
+                continue
+            for row in target.rows:
+                self._assign_player(row, player, node.side)
+                changed_rows.append(row)
+        return changed_rows
+
+    def _assign_player(self, row, player, side):
+        id_key = f'id{side}'
+        # Seasons written before the bracket filled the first free side.
+        if row[id_key] != '':
+            id_key = f'id{1 - side}'
+        row[id_key] = player
+        if self._pair_key(row) is not None:
+            self._pair_rows.setdefault(self._pair_key(row), []).append(row)
 
     def get_rated_list(self):
         groups = self.get_groups()
         for group in groups.values():
-            group.compute_table(self.db)
+            group.get_table()
 
         result = []
 
@@ -435,7 +568,7 @@ class TournamentUtils:
     def get_fixed_playoff(self):
         groups = self.get_groups()
         for group in groups.values():
-            group.compute_table(self.db)
+            group.get_table()
         
         groupA = groups['A']
         groupB = groups['B']
@@ -464,40 +597,66 @@ class TournamentUtils:
         if self.get_stage() != 'PLAYOFF-COMPLETE':
             return ''
 
-        final_record = next((row for row in self.data if  row['tag'] == 'final'), None)
-        third_record = next((row for row in self.data if  row['tag'] == 'third'), None)
-
-        if not final_record or not third_record:
-            return 'Final or third-place match data is missing.'
-
         try:
-            _, gold_id, silver_id, _ = self._analyze_matches(final_record['id0'], final_record['id1'])
-            _, bronze_id, _, _ = self._analyze_matches(third_record['id0'], third_record['id1'])
+            gold_id, silver_id, bronze_id = self.get_medalists()
 
             gold = self.db.get_username_by_id(gold_id)
             silver = self.db.get_username_by_id(silver_id)
-            bronze = self.db.get_username_by_id(bronze_id)
+            bronze = self.db.get_username_by_id(bronze_id) if bronze_id is not None else None
 
-            if not gold or not silver or not bronze:
+            if not gold or not silver or (bronze_id is not None and not bronze):
                 raise ValueError('User data for winners is missing.')
         except Exception as e:
             return str(e)
 
+        self._archive()
+
         header = (
             f'{self.name}, {self.id}-й сезон завершен!\n\n'
             f'Поздравляем @{gold} c победой! 🏆 \n\n')
         
-        body = (
-            'Призеры турнира:\n'
-            f'🥇 @{gold}\n🥈 @{silver}\n🥉 @{bronze}\n\n'
-        )
+        body = f'Призеры турнира:\n🥇 @{gold}\n🥈 @{silver}\n'
+        if bronze:
+            body += f'🥉 @{bronze}\n'
+        body += '\n'
 
         if with_header:
             body = header + body
         return body
 
+    def get_medalists(self):
+        """Returns the (gold, silver, bronze) player IDs of a finished playoff; bronze is None without a third place."""
+        final = self._bracket.get('final', 0)
+        third = self._bracket.get('third', 0)
+
+        if not final or not final.rows:
+            raise ValueError('Final or third-place match data is missing.')
+        _, gold_id, silver_id, _ = self._analyze_matches(final.rows[0]['id0'], final.rows[0]['id1'])
+
+        if third and third.rows:
+            _, bronze_id, _, _ = self._analyze_matches(third.rows[0]['id0'], third.rows[0]['id1'])
+            return gold_id, silver_id, bronze_id
+
+        # A bye into the final leaves no third-place match: bronze is the other semifinal's loser.
+        semifinals = [node for node in final.children if node.rows]
+        if not semifinals:
+            return gold_id, silver_id, None
+        if len(semifinals) != 1:
+            raise ValueError('Final or third-place match data is missing.')
+        _, _, bronze_id, _ = self._analyze_matches(semifinals[0].rows[0]['id0'], semifinals[0].rows[0]['id1'])
+        return gold_id, silver_id, bronze_id
+
+    def _archive(self):
+        """Registers the finished season in the archive, once per change of the league."""
+        if self._archived_version == self.version:
+            return
+        try:
+            get_archive(self.path).ingest(self)
+            self._archived_version = self.version
+        except Exception as e:
+            print(f"[_archive] {self.league_tag}-{self.id} not archived: {e}")
+
     def get_user_matches_list(self, user_id):
-        self._read_data()
         matches = []
         for row in self.data:
             if user_id in [row['id0'], row['id1']]:
@@ -511,14 +670,18 @@ class TournamentUtils:
 
         
 
-    # def get_history(self):
-    #     resp = ""
-    #     for row in self.worksheet.get_all_values():
-    #         resp += f"{row[1]}-{row[0]}\n"
-    #         resp += f"🥇 {row[2]}\n🥈 {row[3]}\n🥉 {row[4]}\n\n"
-    #     return resp
-            
-
-
-
-
+_tournaments = {}
+
+def get_tournament(db, path, tag, season):
+    """Returns the long-lived league for (tag, season), reloading it only if its file changed."""
+    key = (path, tag, season)
+    tournament = _tournaments.get(key)
+    count_cache('league', tournament is not None)
+    if tournament is None:
+        tournament = TournamentUtils(db, path, tag, season)
+        _tournaments[key] = tournament
+    else:
+        with tournament.storage.lock:
+            tournament.db = db
+            tournament.refresh()
+    return tournament
@@ -1,28 +1,73 @@
-import csv
+from utils.storage import open_users_storage
+from utils.file_lock import locked
+from utils.metrics import count_cache, count_parse, timed
 
 class UsersDatabaseCSV:
-    def __init__(self, file_path):
-        self.file_path = f"{file_path}/users.csv"
+    def __init__(self, file_path, storage=None):
+        self.storage = storage or open_users_storage(file_path)
+        self.file_path = self.storage.file_path
         self.data = []
-        with open(self.file_path, mode='r', newline='') as file:
-            reader = csv.DictReader(file)
-            self.data = [row for row in reader]
-            for row in self.data:
-                row['ID'] = int(row['ID'])
-                row['rate'] = int(row['rate'])
-                row['active'] = int(row['active'])
+        self._by_id = {}
+        self._by_username = {}
+        self._indexed_names = {}
+        self._stamp = None
+        # Bumped on every change, so renders that show users know when they are stale.
+        self.version = 0
+        self._read_data()
+
+    @timed('read_users')
+    def _read_data(self):
+        count_parse('users')
+        self._stamp = self.storage.stamp()
+        self.data = self.storage.load()
+        self._reindex()
+        self.version += 1
+
+    def refresh(self):
+        """Reloads the users if the storage was changed outside the bot."""
+        if self.storage.stamp() != self._stamp:
+            print(f"[refresh] {self.file_path} changed on disk, reloading")
+            self._read_data()
 
     def get_all_users(self):
         """Returns the list of users."""
         return self.data
 
+    def _reindex(self):
+        self._by_id = {}
+        self._by_username = {}
+        self._indexed_names = {}
+        for user in self.data:
+            self._by_id.setdefault(user['ID'], user)
+            self._index_username(user)
+
+    def _index_username(self, user):
+        """Keeps the lower-cased username index in sync with the user's current username."""
+        old_name = self._indexed_names.pop(user['ID'], None)
+        if old_name is not None and self._by_username.get(old_name) is user:
+            del self._by_username[old_name]
+        if user['username']:
+            name = user['username'].lower()
+            self._by_username.setdefault(name, user)
+            self._indexed_names[user['ID']] = name
+
+    def _unindex(self, user):
+        self._by_id.pop(user['ID'], None)
+        name = self._indexed_names.pop(user['ID'], None)
+        if name is not None and self._by_username.get(name) is user:
+            del self._by_username[name]
+
+    @timed('get_user')
     def get_user(self, key, key_type = 'ID'):
         if key_type == 'ID':
-            key = int(key)
-        for user in self.data:
-            if user[key_type] == key:
-                return user
-        raise KeyError(f"User with {key_type} = {key} not found.")
+            user = self._by_id.get(int(key))
+        elif key_type == 'username':
+            user = self._by_username.get(str(key).lower())
+        else:
+            user = next((user for user in self.data if user[key_type] == key), None)
+        if user is None:
+            raise KeyError(f"User with {key_type} = {key} not found.")
+        return user
 
     def get_username_by_id(self, user_id):
         try:
@@ -30,10 +75,19 @@ class UsersDatabaseCSV:
         except:
             return ""
 
+    def get_usernames(self, ids):
+        """Returns usernames for the given IDs, empty string for unknown ones."""
+        usernames = []
+        for user_id in ids:
+            user = self._by_id.get(user_id)
+            usernames.append(user['username'] if user else "")
+        return usernames
+
     def get_id_by_username(self, username):
         return self.get_user(username,'username')['ID']
 
 
+    @locked
     def add_user(self, id, username):
         user = {
             "ID": id,
@@ -49,42 +103,50 @@ class UsersDatabaseCSV:
             raise ValueError("User data must contain an 'ID' field.")
         
         # Check if a user with the same ID already exists
-        if any(existing_user['ID'] == user_id for existing_user in self.data):
+        if user_id in self._by_id:
             return
         
         self.data.append(user)
-        self._save_data()
+        self._by_id[user_id] = user
+        self._index_username(user)
+        self._save_data(user)
 
+    @locked
     def update_user(self, updated_user):   
-        for i, user in enumerate(self.data):
-            if user['ID'] == updated_user['ID']:
-                self.data[i] = updated_user
-                self._save_data()
-                return
-        print(f"User with ID {updated_user['ID']} not found.")
+        user = self._by_id.get(updated_user['ID'])
+        if user is None:
+            print(f"User with ID {updated_user['ID']} not found.")
+            return
+
+        if user is not updated_user:
+            self.data[self.data.index(user)] = updated_user
+            self._unindex(user)
+            self._by_id[updated_user['ID']] = updated_user
+        self._index_username(updated_user)
+        self._save_data(updated_user)
 
+    @locked
     def delete_user(self, user_id):
-        user_id = str(user_id) 
-
-        for i, user in enumerate(self.data):
-            print(user)
-            if user['ID'] == user_id:
-                del self.data[i]
-                self._save_data()
-                return
-        print(f"User with ID {user_id} not found.")
-
-    def _save_data(self):
-        """Writes the current data to the CSV file."""
-        with open(self.file_path, mode='w', newline='') as file:
-            if self.data:
-                fieldnames = self.data[0].keys()
-                writer = csv.DictWriter(file, fieldnames=fieldnames)
-                writer.writeheader()
-                writer.writerows(self.data)
-            else:
-                writer = csv.DictWriter(file, fieldnames=[])
-                writer.writeheader()
+        user = self._by_id.get(int(user_id))
+        if user is None:
+            print(f"User with ID {user_id} not found.")
+            return
+
+        self.data.remove(user)
+        self._unindex(user)
+        self.storage.delete_user(user['ID'], self.data)
+        self._stamp = self.storage.stamp()
+        self.version += 1
+
+    @timed('save_users')
+    def _save_data(self, user=None):
+        """Writes the changed user, or all users, to the storage."""
+        if user is None:
+            self.storage.save_all(self.data)
+        else:
+            self.storage.save_user(user, self.data)
+        self._stamp = self.storage.stamp()
+        self.version += 1
 
     def get_rating_table(self):
         active_users = [user for user in self.data if user['active'] == 1]
@@ -95,6 +157,7 @@ class UsersDatabaseCSV:
             respond += f"{i}. {participant['username']} [{participant['rate']}]\n"
         return respond
         
+    @locked
     def update_record(self, id, username, key, value):
         try:         
             player = self.get_user(id)
@@ -117,3 +180,18 @@ class UsersDatabaseCSV:
             except KeyError:
                 return None
         return ids
+
+
+_databases = {}
+
+def get_users_database(file_path):
+    """Returns the shared users database for the path, loading it on first use."""
+    db = _databases.get(file_path)
+    count_cache('users', db is not None)
+    if db is None:
+        db = UsersDatabaseCSV(file_path)
+        _databases[file_path] = db
+    else:
+        with db.storage.lock:
+            db.refresh()
+    return db